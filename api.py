@@ -0,0 +1,248 @@
+"""Headless JSON search API for WorkWise, next to the Streamlit UI.
+
+A plain ASGI application (no web framework): every worker process loads the
+index once at startup and answers
+
+    GET /search?q=gaji+lembur&model=tfidf|bm25|hybrid|both&k=10
+                      hits with score, title, url, sumber and an HTML snippet (query terms in <mark>)
+    GET /health
+    GET /metrics      per-stage search timings (tracing.py) in Prometheus text format
+
+Scoring runs on a thread pool, so the event loop keeps accepting requests
+while NumPy works; ``model=both`` scores TF-IDF and BM25 side by side and
+``model=hybrid`` fuses them into one ranking (ranking.HybridEngine). Like
+app.py, a worker switches to a new index generation (search_index.py
+add/delete/merge) without restarting, and results are cached per generation.
+
+    python api.py --port 8000 --workers 4
+    uvicorn api:app --workers 4          # index/corpus from WORKWISE_INDEX_DIR / WORKWISE_CORPUS
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from urllib.parse import parse_qs
+
+from search import MODELS, DISPLAY_COLUMNS, rank
+from query_cache import QueryCache
+from tracing import tracer, span
+
+DEFAULT_K = 10
+# what model=both returns
+SIDE_BY_SIDE = ('tfidf', 'bm25')
+MAX_K = 100
+# how often a worker looks at index/CURRENT for a new generation
+RELOAD_INTERVAL = 1.0
+
+
+class SearchService:
+    """The index generation a worker process serves, plus its result cache."""
+
+    def __init__(self, index_dir='index', corpus_path='corpus_final_stemmed.csv',
+                 cache_size=512, reload_interval=RELOAD_INTERVAL):
+        self.index_dir = index_dir
+        self.corpus_path = corpus_path
+        self.reload_interval = reload_interval
+        self.cache = QueryCache(maxsize=cache_size)
+        self.state = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load CURRENT (rebuilt if missing or built from another corpus); called once per process."""
+        from search_index import load_index
+        with self._lock:
+            if self.state is None:
+                self._use(load_index(self.index_dir, self.corpus_path, on_stale='rebuild'))
+        return self.state
+
+    def _use(self, index):
+        # one tuple, swapped in a single assignment: requests in flight keep the old generation
+        self.state = (index.version, index.n_docs, index.tfidf(), index.bm25(), index.documents(),
+                      index.snippeter())
+
+    def current(self):
+        """``(version, n_docs, tfidf, bm25, documents, snippeter)``, switching to a newer generation if one was published."""
+        from search_index import SearchIndex, current_version, merge_in_background
+        state = self.state or self.load()
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return state
+        with self._lock:
+            self._checked = now
+            version = current_version(self.index_dir)
+            if version and version != self.state[0]:
+                self._use(SearchIndex(self.index_dir, version))
+                merge_in_background(self.index_dir)
+        return self.state
+
+    def search(self, query, model, k=DEFAULT_K):
+        """Hits of one model as JSON-ready dicts, best first; returns ``(version, hits)``."""
+        version, _, tfidf, bm25, docs, snippeter = self.current()
+
+        def compute():
+            ranking = rank(query, model, tfidf, bm25, k)
+            ids, scores = ranking.ids, ranking.scores
+            with span('fetch'):
+                fields = {col: docs.get(col, ids) for col in DISPLAY_COLUMNS if col != 'snippet'}
+            with span('snippet'):
+                # escaped HTML, query terms in <mark>
+                fields['snippet'] = snippeter.snippets(ids, ranking.tokens)
+            return [
+                {'rank': position, 'doc_id': int(doc_id), 'score': float(score),
+                 **{col: values[position - 1] for col, values in fields.items()}}
+                for position, (doc_id, score) in enumerate(zip(ids, scores), start=1)
+            ]
+        with tracer.trace(model):
+            return version, self.cache.get_or_compute(query, model, k, compute, version=version)
+
+
+_service = None
+
+
+def get_service():
+    """This process' SearchService (index location from WORKWISE_INDEX_DIR / WORKWISE_CORPUS)."""
+    global _service
+    if _service is None:
+        _service = SearchService(os.environ.get('WORKWISE_INDEX_DIR', 'index'),
+                                 os.environ.get('WORKWISE_CORPUS', 'corpus_final_stemmed.csv'))
+    return _service
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_search_params(query_string):
+    """``(q, models, k)`` from the raw query string; raises BadRequest on invalid values."""
+    params = parse_qs(query_string.decode('latin-1'), keep_blank_values=True)
+    q = params.get('q', [''])[0].strip()
+    if not q:
+        raise BadRequest("missing query parameter 'q'")
+    model = params.get('model', ['both'])[0]
+    if model != 'both' and model not in MODELS:
+        raise BadRequest(f"model must be one of {', '.join(MODELS + ('both',))}")
+    try:
+        k = int(params.get('k', [DEFAULT_K])[0])
+    except ValueError:
+        raise BadRequest('k must be an integer') from None
+    if not 1 <= k <= MAX_K:
+        raise BadRequest(f'k must be between 1 and {MAX_K}')
+    return q, (SIDE_BY_SIDE if model == 'both' else (model,)), k
+
+
+async def handle_search(query_string):
+    q, models, k = parse_search_params(query_string)
+    service = get_service()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # each model on its own pool thread; scoring releases the GIL
+    done = await asyncio.gather(*(loop.run_in_executor(None, service.search, q, m, k) for m in models))
+    return {
+        'query': q,
+        'model': models[0] if len(models) == 1 else 'both',
+        'k': k,
+        'version': done[0][0],
+        'took_ms': round((time.perf_counter() - start) * 1000, 3),
+        'results': {m: hits for m, (_, hits) in zip(models, done)},
+    }
+
+
+async def handle_health():
+    version, n_docs = get_service().current()[:2]
+    return {'status': 'ok', 'version': version, 'n_docs': n_docs, 'cache': get_service().cache.stats()}
+
+
+async def handle_metrics():
+    cache = get_service().cache.stats()
+    lines = [tracer.prometheus()]
+    for name, kind in (('hits', 'counter'), ('misses', 'counter'), ('size', 'gauge')):
+        metric = f'workwise_query_cache_{name}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# TYPE {metric} {kind}\n{metric} {cache[name]}\n')
+    return ''.join(lines)
+
+
+ROUTES = {
+    '/search': handle_search,
+    '/health': handle_health,
+    '/metrics': handle_metrics,
+}
+
+
+async def send_body(send, status, body, content_type, head=False):
+    # a HEAD response has the headers (and content-length) of the GET one, but no body
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def send_json(send, status, payload, head=False):
+    await send_body(send, status, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                    b'application/json; charset=utf-8', head)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                # load before the first request instead of during it
+                await asyncio.get_running_loop().run_in_executor(None, get_service().load)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """The ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    head = scope['method'] == 'HEAD'
+    handler = ROUTES.get(scope['path'])
+    if handler is None:
+        return await send_json(send, 404, {'error': f"not found: {scope['path']}"}, head)
+    if scope['method'] not in ('GET', 'HEAD'):
+        return await send_json(send, 405, {'error': 'only GET is supported'})
+    try:
+        if handler is handle_search:
+            payload = await handler(scope.get('query_string', b''))
+        else:
+            payload = await handler()
+    except BadRequest as e:
+        return await send_json(send, 400, {'error': str(e)}, head)
+    if isinstance(payload, str):
+        return await send_body(send, 200, payload.encode('utf-8'), b'text/plain; version=0.0.4; charset=utf-8',
+                               head)
+    await send_json(send, 200, payload, head)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the WorkWise search index as a JSON API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (each loads the index once)')
+    parser.add_argument('--index-dir', default='index', help='Index directory (see search_index.py)')
+    parser.add_argument('--corpus', default='corpus_final_stemmed.csv', help='Stemmed corpus CSV')
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('uvicorn is needed to serve the API: pip install uvicorn') from None
+    # the workers import this module afresh, so the settings travel through the environment
+    os.environ['WORKWISE_INDEX_DIR'] = args.index_dir
+    os.environ['WORKWISE_CORPUS'] = args.corpus
+    uvicorn.run('api:app', host=args.host, port=args.port, workers=args.workers, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from rank_bm25 import BM25Okapi
-import time
+import html
 import os
+from search_index import load_index, SearchIndex, current_version, merge_in_background
+from search import rank, page_rows, search_concurrently, DISPLAY_COLUMNS, DEEP_K, PAGE_SIZE
+from query_cache import QueryCache, normalize_query
+from tracing import tracer, span, STAGES
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -14,6 +16,10 @@ st.set_page_config(
 )
 
 # --- CUSTOM CSS ---
+# All static CSS lives in this one block. It is identical on every rerun and well over
+# global.minCachedMessageSize (10 kB), so Streamlit sends it to a browser session once and
+# afterwards only a reference to the cached message; keep per-page <style> tags out of the
+# other markdown calls, they would be shipped again on each rerun.
 st.markdown("""
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Plus+Jakarta+Sans:wght@300;400;500;600;700;800&display=swap');
@@ -437,6 +443,16 @@ st.markdown("""
         gap: 10px;
     }
     
+    .latency-badge {
+        margin-left: auto;
+        font-size: 0.8rem;
+        font-weight: 600;
+        color: #0e7490;
+        background: rgba(255,255,255,0.7);
+        padding: 4px 10px;
+        border-radius: 999px;
+    }
+    
     .result-card {
         background: linear-gradient(135deg,rgba(255,255,255,0.8),rgba(240,249,255,0.6));
         border: 1px solid rgba(6,182,212,0.15);
@@ -501,6 +517,13 @@ st.markdown("""
         margin-bottom: 14px;
     }
     
+    .result-snippet mark {
+        background: rgba(253,224,71,0.55);
+        color: inherit;
+        padding: 0 2px;
+        border-radius: 3px;
+    }
+    
     .source-badge {
         background: linear-gradient(135deg, #06b6d4 0%, #34d399 100%);
         color: white;
@@ -564,6 +587,13 @@ st.markdown("""
         animation: pulse 1.5s ease-in-out infinite;
     }
     
+    .page-info {
+        text-align: center;
+        color: #0e7490;
+        font-weight: 600;
+        padding-top: 8px;
+    }
+    
     .no-results {
         text-align: center;
         color: #9ca3af;
@@ -758,23 +788,109 @@ st.markdown("""
         .feature-icon { font-size: 2rem; }
         .stTextInput > div > div > input { padding: 10px 16px; font-size: 0.95rem; }
     }
+
+    /* Search page: text input inside the hero */
+    .stTextInput > div > div > input {
+        width:100% !important;
+        background: rgba(255,255,255,0.96);
+        border: 2px solid rgba(229,231,235,0.6);
+        border-radius: 999px;
+        padding: 16px 34px;
+        color: #1f2937;
+        font-size: 1.05rem;
+        box-shadow: 0 10px 28px rgba(0,0,0,0.08);
+        transition: all 0.25s ease;
+    }
+    .stTextInput > div > div > input:focus {
+        border-color: rgba(8,145,178,0.95);
+        box-shadow: 0 18px 46px rgba(8,145,178,0.12), 0 0 0 8px rgba(8,145,178,0.06);
+        transform: translateY(-2px);
+    }
+    .stTextInput > div > div > input::placeholder { color: #9ca3af; font-size:1.03rem; }
+    /* target the widget container that immediately follows the search-section */
+    .search-section + div .stTextInput {
+        max-width: 1100px;
+        width: 90%;
+        margin: 6px auto 0 auto;
+    }
+    .search-section + div .stTextInput > div > div > input {
+        width: 100% !important;
+        border-radius: 999px;
+        padding: 16px 34px;
+        box-shadow: 0 10px 28px rgba(0,0,0,0.08);
+    }
+
+    /* Comparison button - DARK BLUE */
+    div[data-testid="column"] button[kind="secondary"] {
+        background-color: #1e3a8a !important;
+        color: white !important;
+        padding: 16px 40px !important;
+        border-radius: 10px !important;
+        font-weight: 600 !important;
+        font-size: 1.05rem !important;
+        border: none !important;
+        box-shadow: 0 4px 15px rgba(30, 58, 138, 0.3) !important;
+        transition: all 0.3s ease !important;
+        width: 100% !important;
+        white-space: nowrap !important;
+    }
+    
+    div[data-testid="column"] button[kind="secondary"]:hover {
+        transform: translateY(-2px) !important;
+        box-shadow: 0 6px 25px rgba(30, 58, 138, 0.4) !important;
+        background-color: #1e40af !important;
+    }
+    
+    div[data-testid="column"] button[kind="secondary"]:active {
+        transform: translateY(0) !important;
+    }
 </style>
 """, unsafe_allow_html=True)
 
 # --- LOAD CORPUS ---
 @st.cache_resource
-def load_data():
-    df_all = pd.read_csv("corpus_final_stemmed.csv")
-    
-    tfidf = TfidfVectorizer()
-    X = tfidf.fit_transform(df_all['body_stemmed'])
-    
-    tokenized_corpus = [doc.split() for doc in df_all['body_stemmed']]
-    bm25 = BM25Okapi(tokenized_corpus)
-    
-    return df_all, tfidf, X, bm25
+def ensure_index():
+    # TF-IDF matrix and BM25 postings come from the prebuilt index (python search_index.py);
+    # it is only rebuilt here (once per process) when the corpus checksum no longer matches
+    return load_index("index", "corpus_final_stemmed.csv", on_stale="rebuild").version
+
+@st.cache_resource(max_entries=2)
+def load_data(version):
+    # one entry per index generation: `search_index.py add/delete/merge` publishes a new
+    # one and the next rerun loads it, no restart needed
+    index = SearchIndex("index", version)
+    tfidf = index.tfidf()
+    bm25 = index.bm25()
+    
+    # columnar store of each segment: only the shown fields are read
+    corpus = index.documents()
+    # snippets around the query terms, cut from the original body of the shown hits only
+    snippeter = index.snippeter()
+    # optional semantic model: None until `python dense.py build` ran for this generation
+    dense = index.dense()
+    return corpus, tfidf, bm25, snippeter, dense, index.version
+
+# Shared by every session in this process; emptied when the index version changes
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(maxsize=512)
+
+# Ranked candidates (search.RankedList) of this session's recent queries, one entry per
+# (query, model), so the next pages are sliced from them instead of scoring again.
+# At most 16 entries of ~8 kB; the cache goes away with the session.
+def session_rankings():
+    if 'rankings' not in st.session_state:
+        st.session_state['rankings'] = QueryCache(maxsize=16)
+    return st.session_state['rankings']
 
-df_all, tfidf, X, bm25 = load_data()
+def move_cursor(step):
+    st.session_state['result_cursor'] = max(0, st.session_state.get('result_cursor', 0) + step)
+
+ensure_index()
+corpus, tfidf, bm25, snippeter, dense, index_version = load_data(current_version("index"))
+# compacts the segments in a daemon thread once there are too many
+merge_in_background("index")
+query_cache = get_query_cache()
 
 # --- PAGE ROUTING (query param 'page=search' opens standalone search page) ---
 # Use `st.query_params` (replacement for experimental_get_query_params)
@@ -805,39 +921,39 @@ if is_splash:
     """, unsafe_allow_html=True)
     st.stop()
 
-# --- SEARCH FUNCTIONS ---
-def simple_search(query, tfidf, X, df, n=10):
-    q_vec = tfidf.transform([query])
-    scores = (X * q_vec.T).toarray()
-    top_idx = scores.flatten().argsort()[::-1][:n]
-    return df.iloc[top_idx][['title', 'body_stemmed', 'sumber', 'url']]
+def _escaped(values):
+    # one line of escaped text per value: a blank line would end the raw HTML block in markdown
+    return [html.escape(' '.join(str(v).split())) for v in values]
 
-def bm25_search(query, bm25, df, n=10):
-    query_tokens = query.lower().split()
-    scores = bm25.get_scores(query_tokens)
-    top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n]
-    return df.iloc[top_idx][['title', 'body_stemmed', 'sumber', 'url']]
+def results_html(results):
+    """All result cards of one model as a single HTML fragment, built column-wise (no iterrows).
 
-def render_results(results, model_name, icon):
-    st.markdown(f"<div class='section-header'>{icon} {model_name}</div>", unsafe_allow_html=True)
-    
+    ``snippet`` is already escaped HTML (snippets.Snippeter); the other fields are escaped here.
+    """
     if len(results) == 0:
-        st.markdown("<div class='no-results'>&#128237; No results found</div>", unsafe_allow_html=True)
-        return
-    
-    for idx, row in results.iterrows():
-        snippet = row['body_stemmed'][:200] + '...' if len(row['body_stemmed']) > 200 else row['body_stemmed']
-        
-        st.markdown(f"""
-        <div class='result-card'>
-            <a href="{row['url']}" target="_blank" class='result-title'>
-                {row['title']}
-            </a>
-            <div class='result-url'>&#128279; {row['url']}</div>
-            <div class='result-snippet'>{snippet}</div>
-            <span class='source-badge'>{row['sumber']}</span>
-        </div>
-        """, unsafe_allow_html=True)
+        return "<div class='no-results'>&#128237; No results found</div>"
+    return ''.join(
+        f"<div class='result-card'><a href=\"{url}\" target=\"_blank\" class='result-title'>{title}</a>"
+        f"<div class='result-url'>&#128279; {url}</div>"
+        f"<div class='result-snippet'>{snippet}</div>"
+        f"<span class='source-badge'>{sumber}</span></div>"
+        for title, url, snippet, sumber in zip(_escaped(results['title']), _escaped(results['url']),
+                                              results['snippet'].tolist(), _escaped(results['sumber']))
+    )
+
+# selectable models (search.MODELS): display name and icon
+MODEL_LABELS = {
+    'tfidf': ("TF-IDF", "&#128202;"),
+    'bm25': ("BM25", "&#127919;"),
+    'hybrid': ("Hybrid", "&#10024;"),
+    'semantic': ("Semantic (LSA)", "&#129504;"),
+}
+
+def render_results(slot, cards_html, model_name, icon, latency_ms=None):
+    # header and cards in one markdown call: one delta message per result column
+    latency = f"<span class='latency-badge'>{latency_ms:.1f} ms</span>" if latency_ms is not None else ""
+    slot.markdown(f"<div class='section-header'>{icon} {model_name}{latency}</div>{cards_html}",
+                  unsafe_allow_html=True)
 
 # --- NAVIGATION BAR ---
 if not is_search_page:
@@ -868,8 +984,8 @@ if not is_search_page:
 """, unsafe_allow_html=True)
 
 # --- STATS DASHBOARD ---
-total_docs = len(df_all)
-unique_sources = df_all['sumber'].nunique()
+total_docs = len(corpus)
+unique_sources = corpus.nunique('sumber')
 
 if not is_search_page:
     st.markdown(f"""
@@ -932,25 +1048,6 @@ if is_search_page:
         <h2 class='search-title' style='margin-bottom:12px;font-size:2.4rem;color:#0891b2;'>&#128270; Start Your Search</h2>
         <p style='color:#475569;font-size:1.02rem;margin-bottom:18px;text-align:center;max-width:860px;'>Temukan informasi yang Anda butuhkan dengan dual-algorithm search yang akurat dan cepat</p>
         <div style='width:100%;max-width:1100px;margin:8px auto 6px auto;'>
-            <style>
-                .stTextInput > div > div > input {
-                    width:100% !important;
-                    background: rgba(255,255,255,0.96);
-                    border: 2px solid rgba(229,231,235,0.6);
-                    border-radius: 999px;
-                    padding: 16px 34px;
-                    color: #1f2937;
-                    font-size: 1.05rem;
-                    box-shadow: 0 10px 28px rgba(0,0,0,0.08);
-                    transition: all 0.25s ease;
-                }
-                .stTextInput > div > div > input:focus {
-                    border-color: rgba(8,145,178,0.95);
-                    box-shadow: 0 18px 46px rgba(8,145,178,0.12), 0 0 0 8px rgba(8,145,178,0.06);
-                    transform: translateY(-2px);
-                }
-                .stTextInput > div > div > input::placeholder { color: #9ca3af; font-size:1.03rem; }
-            </style>
             <div class='search-input-wrapper' style='position:relative;'>
                 <!-- Streamlit input will be rendered below -->
             </div>
@@ -959,24 +1056,6 @@ if is_search_page:
 </div>
 """, unsafe_allow_html=True)
 
-    # Ensure the Streamlit text input visually aligns inside the search hero
-    st.markdown("""
-    <style>
-        /* target the widget container that immediately follows the search-section */
-        .search-section + div .stTextInput {
-            max-width: 1100px;
-            width: 90%;
-            margin: 6px auto 0 auto;
-        }
-        .search-section + div .stTextInput > div > div > input {
-            width: 100% !important;
-            border-radius: 999px;
-            padding: 16px 34px;
-            box-shadow: 0 10px 28px rgba(0,0,0,0.08);
-        }
-    </style>
-    """, unsafe_allow_html=True)
-
     # Render an actual Streamlit text input so the standalone search page is interactive
     query = st.text_input(
         label="Search",
@@ -984,21 +1063,84 @@ if is_search_page:
         label_visibility="collapsed",
         key="search_input_search"
     )
+    # Hybrid = TF-IDF and BM25 fused into one ranking (ranking.HybridEngine);
+    # Semantic = LSA vectors (dense.py), offered only once they are built for this index
+    models = st.multiselect(
+        "Model",
+        [m for m in MODEL_LABELS if m != 'semantic' or dense is not None],
+        default=['tfidf', 'bm25'],
+        format_func=lambda m: MODEL_LABELS[m][0],
+        key="search_models"
+    ) or ['tfidf', 'bm25']
 
 # --- RESULTS SECTION for standalone search page ---:
 if 'query' not in locals():
     query = None
 
 if query:
-    st.markdown("<div class='loading-container'><span class='loading-dots'>&#9889; Searching for best results...</span></div>", unsafe_allow_html=True)
-    time.sleep(0.3)
-    col1, col2 = st.columns(2, gap="large")
-    with col1:
-        tfidf_res = simple_search(query, tfidf, X, df_all)
-        render_results(tfidf_res, "TF-IDF Results", "&#128202;")
-    with col2:
-        bm25_res = bm25_search(query, bm25, df_all)
-        render_results(bm25_res, "BM25 Results", "&#127919;")
+    # one placeholder per selected model, filled as soon as that ranker finishes
+    slots = {name: col.empty() for name, col in zip(models, st.columns(len(models), gap="large"))}
+    for slot in slots.values():
+        slot.markdown("<div class='loading-container'><span class='loading-dots'>&#9889; Searching for best results...</span></div>", unsafe_allow_html=True)
+    labels = {name: MODEL_LABELS[name] for name in models}
+    # a new query starts again at the first page
+    if st.session_state.get('result_query') != normalize_query(query):
+        st.session_state['result_query'] = normalize_query(query)
+        st.session_state['result_cursor'] = 0
+    cursor = st.session_state['result_cursor']
+    # fetched here: session_state is not available on the search threads
+    rankings = session_rankings()
+
+    def search_page(name):
+        ranking = rankings.get_or_compute(query, name, DEEP_K,
+                                          lambda: rank(query, name, tfidf, bm25, dense=dense),
+                                          version=index_version)
+        results, next_cursor = page_rows(corpus, ranking, cursor, PAGE_SIZE, DISPLAY_COLUMNS, snippeter)
+        # the rendered cards are cached with the hits, so a cache hit skips building the HTML too
+        with span('html'):
+            return results, results_html(results), next_cursor, len(ranking)
+    # per-stage timings of this search; a cache hit records no stages
+    traces = {name: tracer.trace(name) for name in labels}
+
+    def run_search(name):
+        with traces[name]:
+            # rendered pages are shared by all sessions, keyed on (cursor, page size) instead of k
+            return query_cache.get_or_compute(query, name, (cursor, PAGE_SIZE), lambda: search_page(name),
+                                              version=index_version)
+
+    tasks = {name: (lambda name=name: run_search(name)) for name in labels}
+    pages = {}
+    for name, (results, cards_html, next_cursor, total), elapsed_ms in search_concurrently(tasks):
+        with traces[name], span('render'):
+            display_name, icon = labels[name]
+            render_results(slots[name], cards_html, f"{display_name} Results", icon, latency_ms=elapsed_ms)
+        pages[name] = (len(results), next_cursor, total)
+
+    # --- PAGINATION: one cursor for all columns ---
+    shown = max(n for n, _, _ in pages.values())
+    total = max(t for _, _, t in pages.values())
+    if total > PAGE_SIZE and shown:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        prev_col.button("\u2190 Sebelumnya", key='page_prev', disabled=cursor == 0,
+                        on_click=move_cursor, args=(-PAGE_SIZE,), width="stretch")
+        info_col.markdown(f"<div class='page-info'>Hasil {cursor + 1}&#8211;{cursor + shown} dari {total}</div>",
+                          unsafe_allow_html=True)
+        next_col.button("Berikutnya \u2192", key='page_next',
+                        disabled=all(nc is None for _, nc, _ in pages.values()),
+                        on_click=move_cursor, args=(PAGE_SIZE,), width="stretch")
+
+    # --- DEBUG PANEL (?debug=1): stage timings of this search and of the whole process ---
+    if str(st.query_params.get("debug", "")).lower() in ("1", "true", "yes") and tracer.enabled:
+        with st.expander("Debug: search timings", expanded=True):
+            stages = [s for s in STAGES if any(s in t.stages for t in traces.values())]
+            st.markdown("**Search ini (ms)**")
+            st.dataframe(pd.DataFrame(
+                {name: {**{s: t.stages.get(s, 0.0) * 1000 for s in stages}, 'total': t.total() * 1000}
+                 for name, t in traces.items()}).T.round(3))
+            st.markdown("**Semua search di proses ini (ms, p50/p95/p99 dari histogram)**")
+            st.dataframe(pd.DataFrame(tracer.summary()).round(3), hide_index=True)
+            st.markdown(f"Query cache: `{query_cache.stats()}`")
+            st.code(tracer.prometheus(), language="text")
 
 if not is_search_page:
     # Initialize session state for button
@@ -1019,34 +1161,6 @@ if not is_search_page:
     st.markdown("<div style='margin-top: 30px; display: flex; justify-content: center;'>", unsafe_allow_html=True)
     col_l, col_c, col_r = st.columns([1.2, 1.6, 1.2])
     with col_c:
-        # Custom styling for the button - DARK BLUE
-        st.markdown("""
-        <style>
-            div[data-testid="column"] button[kind="secondary"] {
-                background-color: #1e3a8a !important;
-                color: white !important;
-                padding: 16px 40px !important;
-                border-radius: 10px !important;
-                font-weight: 600 !important;
-                font-size: 1.05rem !important;
-                border: none !important;
-                box-shadow: 0 4px 15px rgba(30, 58, 138, 0.3) !important;
-                transition: all 0.3s ease !important;
-                width: 100% !important;
-                white-space: nowrap !important;
-            }
-            
-            div[data-testid="column"] button[kind="secondary"]:hover {
-                transform: translateY(-2px) !important;
-                box-shadow: 0 6px 25px rgba(30, 58, 138, 0.4) !important;
-                background-color: #1e40af !important;
-            }
-            
-            div[data-testid="column"] button[kind="secondary"]:active {
-                transform: translateY(0) !important;
-            }
-        </style>
-        """, unsafe_allow_html=True)
         
         if st.button('Show Algorithm Comparison Plots', key='show_compare', type='secondary'):
             st.session_state['run_compare'] = True
@@ -1087,7 +1201,7 @@ if not is_search_page:
                 except Exception as e:
                     st.warning(f'Could not read metrics CSV: {e}')
             
-            # Display confusion matrices (per-topic, two-per-row: BM25 left, TF-IDF right)
+            # Display confusion matrices (per-topic, two-per-row: BM25 left, TF-IDF right; Hybrid below if evaluated)
             plots_dir = 'plots'
             if os.path.exists(plots_dir):
                 conf_files = [f for f in os.listdir(plots_dir) if f.startswith('confusion_') and f.lower().endswith(('.png', '.jpg', '.jpeg'))]
@@ -1103,7 +1217,9 @@ if not is_search_page:
                             continue
                         topic_part, model_part = rest.rsplit('_', 1)
                         mlow = model_part.lower()
-                        if 'tf' in mlow or 'tf-idf' in mlow:
+                        if 'hybrid' in mlow:
+                            model_key = 'Hybrid'
+                        elif 'tf' in mlow or 'tf-idf' in mlow:
                             model_key = 'TF-IDF'
                         else:
                             model_key = 'BM25'
@@ -1128,6 +1244,11 @@ if not is_search_page:
                                 p = models.get('TF-IDF')
                                 if p and os.path.exists(p):
                                     st.image(p, caption=f"TF-IDF — {label}", width=320)
+                            p = models.get('Hybrid')
+                            if p and os.path.exists(p):
+                                _, mid_col, _ = st.columns([0.6, 1, 0.6])
+                                with mid_col:
+                                    st.image(p, caption=f"Hybrid — {label}", width=320)
     
     except Exception as e:
         st.warning(f'Could not load comparison module or generate plots: {e}')
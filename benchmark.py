@@ -0,0 +1,543 @@
+"""Micro-benchmarks for the search hot path.
+
+Compares the old dense TF-IDF ranking (``(X * q_vec.T).toarray()`` plus a
+full ``argsort``) with the sparse column-gather + partial top-k path in
+search.py, and MaxScore-pruned against exhaustive top-k for both engines,
+on the real corpus and on copies of it stacked 10x / 100x. ``--extraction``
+measures the scrapers' HTML extraction instead (extraction.py).
+
+``--suite`` is the end-to-end run meant to be compared between commits: for
+every size it builds a real index (search_index.build_index, in a fresh
+process so build time and peak memory are not skewed by earlier sizes),
+runs SUITE_QUERIES through every function in :func:`search_functions` and
+writes build time, peak RSS, p50/p95/p99 latency and QPS to JSON or CSV.
+``--compare`` checks a run against an earlier one, flagging only changes
+beyond both ``--tolerance`` and the runs' pass-to-pass spread. ``--dense``
+measures the optional semantic index (dense.py): recall@10 and latency per
+``nprobe`` against brute-force cosine.
+
+    python benchmark.py --sizes 1 10 100
+    python benchmark.py --verify      # pruned == exhaustive on the benchmark queries
+    python benchmark.py --extraction  # HTML extraction pages/second per parser backend
+    python benchmark.py --dense --sizes 1 10 100
+    python benchmark.py --suite -o bench_$(git rev-parse --short HEAD).json --compare bench_main.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+from scipy import sparse
+
+from ranking import BM25Engine, TfidfEngine, tfidf_scores, top_k
+
+QUERIES = ['absensi karyawan', 'gaji', 'cuti', 'manajemen waktu']
+# fixed query set of the suite; changing it makes runs incomparable
+SUITE_QUERIES = QUERIES + [
+    'gaji lembur karyawan', 'cuti tahunan', 'pajak penghasilan pph 21', 'bpjs kesehatan',
+    'kerja remote', 'tips wawancara kerja', 'resign kerja', 'kontrak kerja pkwt',
+    'tunjangan hari raya', 'produktivitas kerja', 'rekrutmen karyawan baru', 'penilaian kinerja',
+    'jam kerja', 'pesangon phk', 'work life balance', 'motivasi kerja',
+]
+# metrics where a higher value is a regression, and those where a lower one is
+LOWER_IS_BETTER = ('build_s', 'peak_rss_mb', 'p50_ms', 'p95_ms', 'p99_ms')
+HIGHER_IS_BETTER = ('qps',)
+
+
+def old_tfidf_topk(X, q_vec, n=10):
+    scores = (X * q_vec.T).toarray()
+    return scores.flatten().argsort()[::-1][:n]
+
+
+def new_tfidf_topk(X, q_vec, n=10):
+    doc_ids, scores = tfidf_scores(X, q_vec)
+    return top_k(scores, n, doc_ids)[0]
+
+
+def time_per_query(fn, X, q_vecs, repeat=20):
+    """Median latency in milliseconds over ``repeat`` runs of the query set."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for q_vec in q_vecs:
+            fn(X, q_vec)
+        runs.append((time.perf_counter() - start) / len(q_vecs))
+    return float(np.median(runs)) * 1000
+
+
+def bench_tfidf_topk(index, sizes=(1, 10, 100), queries=QUERIES, repeat=20):
+    """Latency of old vs new TF-IDF top-k for each corpus multiplier."""
+    vec = index.tfidf_vectorizer()
+    q_vecs = [vec.transform([q]) for q in queries]
+    rows = []
+    for m in sizes:
+        X_csc = sparse.vstack([index.X] * m, format='csc') if m > 1 else index.X
+        X_csr = X_csc.tocsr()
+        rows.append({
+            'multiplier': m,
+            'n_docs': X_csc.shape[0],
+            'old_ms': time_per_query(old_tfidf_topk, X_csr, q_vecs, repeat),
+            'new_ms': time_per_query(new_tfidf_topk, X_csc, q_vecs, repeat),
+        })
+    return rows
+
+
+def verify_pruning(index, queries=QUERIES, k=10):
+    """Compare MaxScore and exhaustive top-k for both engines; returns a list of mismatches.
+
+    Queries are analyzed like real searches (preprocessing.get_analyzer), so
+    the engines see the stemmed terms they are indexed with.
+    """
+    from preprocessing import get_analyzer
+    analyzer = get_analyzer()
+    engines = {'TF-IDF': (index.tfidf(), analyzer.query), 'BM25': (index.bm25(), lambda q: list(analyzer.tokens(q)))}
+    mismatches = []
+    for name, (engine, prep) in engines.items():
+        for q in queries:
+            pruned = engine.top_k(prep(q), k)
+            full = engine.top_k(prep(q), k, exhaustive=True)
+            if not (np.array_equal(pruned[0], full[0]) and np.array_equal(pruned[1], full[1])):
+                mismatches.append((name, q, pruned[0].tolist(), full[0].tolist()))
+    return mismatches
+
+
+def bench_pruning(index, docs, sizes=(1, 10, 100), queries=QUERIES, k=10, repeat=20):
+    """Latency of MaxScore vs exhaustive top-k for both engines per corpus multiplier."""
+    from preprocessing import get_analyzer
+    analyzer = get_analyzer()
+    vec = index.tfidf_vectorizer()
+    rows = []
+    for m in sizes:
+        X = sparse.vstack([index.X] * m, format='csc') if m > 1 else index.X
+        engines = {
+            'TF-IDF': (TfidfEngine(vec, X), [analyzer.query(q) for q in queries]),
+            'BM25': (BM25Engine.from_corpus(list(docs) * m), [list(analyzer.tokens(q)) for q in queries]),
+        }
+        for name, (engine, qs) in engines.items():
+            row = {'multiplier': m, 'n_docs': X.shape[0], 'model': name}
+            for mode, exhaustive in (('exhaustive_ms', True), ('maxscore_ms', False)):
+                row[mode] = time_per_query(lambda e, q: e.top_k(q, k, exhaustive=exhaustive),
+                                           engine, qs, repeat)
+            rows.append(row)
+    return rows
+
+
+def bench_dense(index, sizes=(1, 10), queries=SUITE_QUERIES, nprobes=(1, 2, 4, 8, 16), k=10, repeat=20,
+                dims=None):
+    """Recall@k and latency of dense.DenseIndex (IVF over int8/float16 vectors) against brute-force cosine.
+
+    The reference is exact float32 cosine over every LSA vector. An ANN hit
+    counts as found when its exact cosine reaches the exact k-th best score,
+    so interchangeable ties (duplicated documents, copies in the upscaled
+    corpus) are not counted as misses.
+    """
+    from dense import DenseIndex, DTYPES, DEFAULT_DIMS, embed
+    from preprocessing import get_analyzer
+
+    analyzer = get_analyzer()
+    tfidf = index.tfidf()
+    rows = []
+    for m in sizes:
+        X = sparse.vstack([index.X] * m, format='csr') if m > 1 else index.X
+        for dtype in DTYPES:
+            dense = DenseIndex.build(X, tfidf, dims or DEFAULT_DIMS, dtype=dtype)
+            V = embed(X, dense.components)
+            q_vecs = [q for q in (dense.query_vector(analyzer.query(q)) for q in queries) if q.any()]
+            kth = [np.partition(V @ q, len(V) - k)[len(V) - k] for q in q_vecs]
+            base = {'multiplier': m, 'n_docs': X.shape[0], 'dtype': dtype, 'nlist': dense.nlist,
+                    'vectors_kib': dense.nbytes / 1024}
+            rows.append({**base, 'nprobe': 'exact', 'recall': 1.0,
+                         'ms': time_per_query(lambda V, q: top_k(V @ q, k), V, q_vecs, repeat)})
+            for nprobe in sorted({min(p, dense.nlist) for p in nprobes}):
+                found = []
+                for q, t in zip(q_vecs, kth):
+                    ids, _ = dense.search(q, k, nprobe)
+                    found.append(np.sum(V[ids] @ q >= t - 1e-6) / k)
+                rows.append({**base, 'nprobe': nprobe, 'recall': float(np.mean(found)),
+                             'ms': time_per_query(lambda d, q: d.search(q, k, nprobe), dense, q_vecs, repeat)})
+    return rows
+
+
+def synthetic_pages(csv_paths=('corpus_isi_kompasiana.csv', 'corpus_isi_talenta.csv'), limit=200):
+    """``(html, rule)`` pairs rebuilt from scraped url,title,body,date CSVs.
+
+    Each stored article is wrapped in its site's markup plus the usual
+    navigation/script boilerplate, so no saved pages or network are needed.
+    """
+    import html as html_lib
+    import pandas as pd
+    from extraction import rule_for, TALENTA
+
+    chrome = ''.join(f'<li><a href="/kategori/{i}">Kategori {i}</a></li>' for i in range(60))
+    script = '<script>' + 'var x = 1;' * 300 + '</script>'
+    pages = []
+    for path in csv_paths:
+        df = pd.read_csv(path).fillna('').head(limit)
+        for url, title, body, date in df[['url', 'title', 'body', 'date']].itertuples(index=False):
+            paras = ''.join(f'<p>{html_lib.escape(p)}</p>' for p in str(body).split('\n'))
+            rule = rule_for(url)
+            container = (f'<article class="post">{paras}</article>' if rule is TALENTA
+                         else f'<div class="read__content">{paras}</div>')
+            pages.append((f'<html><head>{script}</head><body><nav><ul>{chrome}</ul></nav>'
+                          f'<h1>{html_lib.escape(str(title))}</h1><time>{html_lib.escape(str(date))}</time>'
+                          f'{container}<footer><ul>{chrome}</ul></footer></body></html>', rule))
+    return pages
+
+
+def load_pages(directory):
+    """``(html, rule)`` pairs for saved ``*.html`` pages; pages under a ``talenta`` folder use the Talenta rule."""
+    import glob
+    import os
+    from extraction import KOMPASIANA, TALENTA
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '**', '*.html'), recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as fh:
+            pages.append((fh.read(), TALENTA if 'talenta' in path.lower() else KOMPASIANA))
+    return pages
+
+
+def bench_extraction(pages, repeat=3):
+    """Pages/second per installed extraction backend, and how many pages differ from html.parser."""
+    from extraction import available_backends, extract
+    reference = [extract(html, rule=rule, backend='html.parser') for html, rule in pages]
+    rows = []
+    for name in available_backends():
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = [extract(html, rule=rule, backend=name) for html, rule in pages]
+            runs.append(time.perf_counter() - start)
+        rows.append({
+            'backend': name,
+            'pages': len(pages),
+            'pages_per_s': len(pages) / float(np.median(runs)),
+            'mismatches': sum(a != b for a, b in zip(out, reference)),
+        })
+    return rows
+
+
+def upscale_corpus(df, multiplier):
+    """``df`` stacked ``multiplier`` times; copies get distinct urls (``url#i``)."""
+    import pandas as pd
+    if multiplier <= 1:
+        return df
+    return pd.concat([df] + [df.assign(url=df['url'].astype(str) + f'#{i}') for i in range(1, multiplier)],
+                     ignore_index=True)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed_build(corpus_path, index_dir):
+    # runs in a fresh process: its peak RSS is the build's, not an earlier size's
+    from search_index import build_index
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    version = build_index(corpus_path, index_dir)
+    elapsed = time.perf_counter() - start
+    rss = _peak_rss_mb()
+    return version, elapsed, rss, (rss - rss_before if rss is not None else None)
+
+
+def build_in_subprocess(corpus_path, index_dir):
+    """``(version, build seconds, peak RSS MB, RSS growth MB)`` of build_index run in a spawned process."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_timed_build, corpus_path, index_dir).result()
+
+
+def search_functions(index):
+    """``{model: fn(query) -> result frame}`` for every search the suite measures.
+
+    Each call is a full search as app.py runs it (analysis, scoring, top-k,
+    fetching the shown columns); new engines get an entry here. ``semantic``
+    is only measured when the generation has a dense index (dense.py).
+    """
+    from search import simple_search, bm25_search, hybrid_search, semantic_search, DISPLAY_COLUMNS
+    tfidf, bm25, docs, dense = index.tfidf(), index.bm25(), index.documents(), index.dense()
+    searches = {
+        'tfidf': lambda q: simple_search(q, tfidf, docs, columns=DISPLAY_COLUMNS),
+        'bm25': lambda q: bm25_search(q, bm25, docs, columns=DISPLAY_COLUMNS),
+        'hybrid': lambda q: hybrid_search(q, tfidf, bm25, docs, columns=DISPLAY_COLUMNS),
+    }
+    if dense is not None:
+        searches['semantic'] = lambda q: semantic_search(q, dense, docs, columns=DISPLAY_COLUMNS)
+    return searches
+
+
+def latency_stats(latencies_ms):
+    lat = np.asarray(latencies_ms)
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'mean_ms': float(lat.mean()), 'qps': float(len(lat) / (lat.sum() / 1000))}
+
+
+def suite_stats(passes_ms):
+    """Latency metrics of repeated passes over the query set (``passes_ms[pass][query]``).
+
+    Each query counts with its median over the passes, so a burst of
+    interference during one pass does not move the percentiles.
+    ``<metric>_spread`` is the interquartile range of the metric computed
+    pass by pass: the run-to-run noise :func:`compare_runs` must see exceeded.
+    """
+    lat = np.asarray(passes_ms)
+    stats = latency_stats(np.median(lat, axis=0))
+    per_pass = [latency_stats(p) for p in lat]
+    for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'qps'):
+        q1, q3 = np.percentile([p[metric] for p in per_pass], [25, 75])
+        stats[f'{metric}_spread'] = float(q3 - q1)
+    return stats
+
+
+def _dir_size_mb(path):
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(path) for f in files) / (1 << 20)
+
+
+def run_suite(corpus_path, sizes=(1, 10, 100), queries=SUITE_QUERIES, repeat=10, build_repeat=3, log=print):
+    """Build an index per corpus multiplier and time every search function on it; one row per (size, model).
+
+    The build is timed ``build_repeat`` times: ``build_s`` is the median,
+    ``build_s_spread`` the range.
+    """
+    import pandas as pd
+    from dense import build_dense
+    from search_index import SearchIndex
+
+    df = pd.read_csv(corpus_path)
+    rows = []
+    for m in sizes:
+        with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+            csv_path = os.path.join(tmp, 'corpus.csv')
+            upscale_corpus(df, m).to_csv(csv_path, index=False)
+            builds = [build_in_subprocess(csv_path, os.path.join(tmp, f'index-{i}'))
+                      for i in range(build_repeat)]
+            # the first build is searched, the others only add timings
+            index_dir = os.path.join(tmp, 'index-0')
+            for i in range(1, build_repeat):
+                shutil.rmtree(os.path.join(tmp, f'index-{i}'))
+            version, _, peak_rss, rss_growth = builds[0]
+            build_times = [b[1] for b in builds]
+            build_s = float(np.median(build_times))
+            # the optional semantic index, so search_functions measures it too (not part of build_s)
+            build_dense(index_dir, version)
+
+            start = time.perf_counter()
+            index = SearchIndex(index_dir, version)
+            searches = search_functions(index)
+            load_ms = (time.perf_counter() - start) * 1000
+            for model, fn in searches.items():
+                for q in queries:  # warm-up: page in the mmapped postings, fill analyzer caches
+                    fn(q)
+                passes = []
+                for _ in range(repeat):
+                    latencies = []
+                    for q in queries:
+                        start = time.perf_counter()
+                        fn(q)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    passes.append(latencies)
+                row = {'multiplier': m, 'n_docs': index.n_docs, 'model': model, 'build_s': build_s,
+                       'build_s_spread': max(build_times) - min(build_times),
+                       'peak_rss_mb': peak_rss, 'build_rss_growth_mb': rss_growth,
+                       'index_mb': _dir_size_mb(index_dir), 'load_ms': load_ms,
+                       'n_queries': repeat * len(queries), **suite_stats(passes)}
+                rows.append(row)
+                log(f"{m:>5} {row['n_docs']:>9} {model:>8} {build_s:>8.2f} "
+                    f"{(peak_rss or float('nan')):>9.1f} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} "
+                    f"{row['p99_ms']:>8.3f} {row['qps']:>9.1f}")
+            del index, searches
+    return rows
+
+
+def run_metadata(corpus_path, queries=SUITE_QUERIES, repeat=10, build_repeat=3):
+    """Commit, environment and settings of a suite run (stored next to the results)."""
+    def git(*cmd):
+        try:
+            return subprocess.run(['git', *cmd], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    import scipy
+    import sklearn
+    from search_index import corpus_checksum
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': os.path.basename(corpus_path),
+        'corpus_sha256': corpus_checksum(corpus_path),
+        'queries': list(queries),
+        'repeat': repeat,
+        'build_repeat': build_repeat,
+    }
+
+
+def save_results(path, meta, rows):
+    """``.csv`` gets one row per (size, model) with the commit and timestamp; anything else is JSON."""
+    if path.endswith('.csv'):
+        import pandas as pd
+        frame = pd.DataFrame(rows)
+        frame.insert(0, 'commit', meta['commit'])
+        frame.insert(1, 'timestamp', meta['timestamp'])
+        frame.to_csv(path, index=False)
+    else:
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump({'meta': meta, 'results': rows}, fh, indent=2)
+
+
+def load_results(path):
+    """``(meta, rows)`` of a file written by :func:`save_results`."""
+    if path.endswith('.csv'):
+        import pandas as pd
+        frame = pd.read_csv(path)
+        meta = {'commit': frame['commit'].iloc[0] if len(frame) else None}
+        return meta, frame.drop(columns=['commit', 'timestamp']).to_dict('records')
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    return data['meta'], data['results']
+
+
+def _spread(row, metric):
+    spread = row.get(f'{metric}_spread')
+    return spread if spread is not None and spread == spread else 0.0
+
+
+def compare_runs(baseline, current, tolerance=0.2):
+    """Relative change of each metric per (multiplier, model); returns ``(rows, regressions)``.
+
+    A change counts as a regression when it is worse than ``tolerance``
+    (0.2 = 20%) in the metric's bad direction and larger than the two runs'
+    ``<metric>_spread`` together (results without a spread only need the
+    tolerance).
+    """
+    base = {(r['multiplier'], r['model']): r for r in baseline}
+    rows, regressions = [], []
+    for r in current:
+        b = base.get((r['multiplier'], r['model']))
+        if b is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = b.get(metric), r.get(metric)
+            if old is None or new is None or not old or old != old or new != new:
+                continue
+            change = new / old - 1
+            noise = _spread(b, metric) + _spread(r, metric)
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            worse = worse and abs(new - old) > noise
+            row = {'multiplier': r['multiplier'], 'model': r['model'], 'metric': metric,
+                   'baseline': old, 'current': new, 'change': change, 'noise': noise, 'regression': worse}
+            rows.append(row)
+            if worse:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TF-IDF top-k latency versus corpus size')
+    parser.add_argument('--index-dir', default='index', help='Index directory (see search_index.py)')
+    parser.add_argument('--corpus', default='corpus_final_stemmed.csv', help='Stemmed corpus CSV')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100], help='Corpus multipliers')
+    parser.add_argument('--repeat', type=int, help='Runs per measurement (default 20; 10 passes over '
+                                                    'the query set with --suite)')
+    parser.add_argument('--verify', action='store_true', help='Only check pruned == exhaustive top-10 and exit')
+    parser.add_argument('--extraction', nargs='?', const='', metavar='PAGES_DIR',
+                        help='Only benchmark HTML extraction, on saved pages or (without a directory) '
+                             'pages rebuilt from the scraped CSVs')
+    parser.add_argument('--dense', action='store_true',
+                        help='Only measure recall@10 and latency of the semantic index (dense.py) per '
+                             'nprobe against brute-force cosine; IVF is only faster on the '
+                             'upscaled corpora, smaller ones get a single exact list')
+    parser.add_argument('--suite', action='store_true',
+                        help='Build an index per size and measure build time, memory and end-to-end '
+                             'search latency percentiles / QPS')
+    parser.add_argument('--build-repeat', type=int, default=3,
+                        help='With --suite: builds timed per size (median and range are kept)')
+    parser.add_argument('--output', '-o', help='With --suite: write results to this .json or .csv file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='With --suite: compare against an earlier results file; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown reported as a regression by --compare (default 0.2)')
+    args = parser.parse_args()
+
+    if args.suite:
+        repeat = args.repeat or 10
+        print(f"{'x':>5} {'docs':>9} {'model':>8} {'build s':>8} {'peak MB':>9} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'p99 ms':>8} {'QPS':>9}")
+        rows = run_suite(args.corpus, args.sizes, repeat=repeat, build_repeat=args.build_repeat)
+        meta = run_metadata(args.corpus, repeat=repeat, build_repeat=args.build_repeat)
+        if args.output:
+            save_results(args.output, meta, rows)
+            print(f"\nHasil disimpan ke {args.output} (commit {(meta['commit'] or '?')[:12]}"
+                  f"{', dirty' if meta['dirty'] else ''})")
+        if args.compare:
+            base_meta, base_rows = load_results(args.compare)
+            changes, regressions = compare_runs(base_rows, rows, args.tolerance)
+            print(f"\nvs {args.compare} (commit {(base_meta.get('commit') or '?')[:12]}):")
+            for c in changes:
+                flag = '  REGRESSION' if c['regression'] else ''
+                print(f"{c['multiplier']:>5} {c['model']:>8} {c['metric']:>12} {c['baseline']:>10.3f} -> "
+                      f"{c['current']:>10.3f} ({c['change']:+.1%}, noise {c['noise']:.3f}){flag}")
+            if regressions:
+                print(f"{len(regressions)} regressions beyond {args.tolerance:.0%} and the run-to-run spread")
+                sys.exit(1)
+        return
+
+    if args.extraction is not None:
+        pages = load_pages(args.extraction) if args.extraction else synthetic_pages()
+        print(f"{'backend':>12} {'pages':>6} {'pages/s':>9} {'mismatch':>9}")
+        for r in bench_extraction(pages, min(args.repeat or 20, 5)):
+            print(f"{r['backend']:>12} {r['pages']:>6} {r['pages_per_s']:>9.1f} {r['mismatches']:>9}")
+        return
+
+    from search_index import load_index
+    index = load_index(args.index_dir, args.corpus)
+
+    if args.dense:
+        print(f"{'x':>5} {'docs':>9} {'dtype':>8} {'KiB':>8} {'nlist':>6} {'nprobe':>7} {'recall@10':>10} {'ms':>8}")
+        for r in bench_dense(index, args.sizes, repeat=args.repeat or 20):
+            print(f"{r['multiplier']:>5} {r['n_docs']:>9} {r['dtype']:>8} {r['vectors_kib']:>8.0f} {r['nlist']:>6} "
+                  f"{r['nprobe']:>7} {r['recall']:>10.3f} {r['ms']:>8.3f}")
+        return
+
+    if args.verify:
+        mismatches = verify_pruning(index)
+        for name, q, pruned, full in mismatches:
+            print(f"MISMATCH {name} '{q}': pruned={pruned} exhaustive={full}")
+        print('OK: pruned top-10 identical to exhaustive' if not mismatches else f'{len(mismatches)} mismatches')
+        sys.exit(1 if mismatches else 0)
+
+    print(f"{'x':>5} {'docs':>9} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for r in bench_tfidf_topk(index, args.sizes, repeat=args.repeat or 20):
+        print(f"{r['multiplier']:>5} {r['n_docs']:>9} {r['old_ms']:>9.3f} {r['new_ms']:>9.3f} "
+              f"{r['old_ms'] / r['new_ms']:>7.1f}x")
+
+    import pandas as pd
+    docs = pd.read_csv(args.corpus)['body_stemmed'].fillna('')
+    print(f"\n{'x':>5} {'docs':>9} {'model':>7} {'exhaustive':>11} {'maxscore':>9}")
+    for r in bench_pruning(index, docs, args.sizes, repeat=args.repeat or 20):
+        print(f"{r['multiplier']:>5} {r['n_docs']:>9} {r['model']:>7} {r['exhaustive_ms']:>11.3f} "
+              f"{r['maxscore_ms']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
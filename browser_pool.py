@@ -0,0 +1,141 @@
+"""Pool of reusable headless Chrome workers for the Selenium crawlers.
+
+link_talenta.py and isi_talenta.py used one driver for every page and
+waited with fixed ``time.sleep(2)`` / ``time.sleep(3)`` calls. Here each of
+``size`` worker threads owns one driver for the whole crawl and takes URLs
+from the executor's work queue; pages are considered loaded as soon as a
+CSS selector is present (``WebDriverWait``) instead of after a fixed delay.
+
+Most pages do not need a browser at all: :func:`fetch_page` first tries a
+plain HTTP GET and only renders the page in Chrome when the wanted element
+(``<article>`` for Talenta) is missing from the raw HTML.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# one user agent for both crawlers
+from crawler import HEADERS
+
+WAIT_TIMEOUT = 10
+
+
+def make_driver():
+    """Headless Chrome configured like the old crawler scripts."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+
+def wait_for(driver, selector, timeout=WAIT_TIMEOUT):
+    """Wait until ``selector`` is present; returns False on timeout (the page is used as is)."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return True
+    except TimeoutException:
+        return False
+
+
+def scroll_to_bottom(driver, timeout=2):
+    """Scroll down and wait until lazily loaded content has grown the page (or ``timeout``)."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+    height = driver.execute_script("return document.body.scrollHeight")
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.body.scrollHeight") > height)
+    except TimeoutException:
+        pass
+
+
+def render(driver, url, selector, timeout=WAIT_TIMEOUT, scroll=False):
+    """``driver.get(url)``, wait for ``selector`` and return the rendered HTML."""
+    driver.get(url)
+    wait_for(driver, selector, timeout)
+    if scroll:
+        scroll_to_bottom(driver)
+    return driver.page_source
+
+
+class BrowserPool:
+    """``size`` worker threads, each lazily starting and then reusing its own driver.
+
+    Use as a context manager; all drivers are quit on exit.
+    ``driver_factory`` is called once per worker (default :func:`make_driver`).
+    """
+
+    def __init__(self, size=4, driver_factory=make_driver):
+        self.size = size
+        self.driver_factory = driver_factory
+        self.drivers = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='browser')
+
+    def driver(self):
+        """The calling worker's driver, started on first use."""
+        if getattr(self._local, 'driver', None) is None:
+            self._local.driver = self.driver_factory()
+            with self._lock:
+                self.drivers.append(self._local.driver)
+        return self._local.driver
+
+    def session(self):
+        """The calling worker's ``requests.Session`` for the HTTP fast path."""
+        if getattr(self._local, 'session', None) is None:
+            import requests
+            self._local.session = requests.Session()
+            self._local.session.headers.update(HEADERS)
+        return self._local.session
+
+    def map(self, fn, items):
+        """Run ``fn(pool, item)`` for every item on the workers; results in input order."""
+        return self._executor.map(lambda item: fn(self, item), items)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.drivers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fetch_page(pool, url, selector, headers=None, timeout=WAIT_TIMEOUT, scroll=False):
+    """HTML of ``url``: plain HTTP first, a pooled browser only if ``selector`` is missing.
+
+    Returns ``(html, via, response)`` where ``via`` is ``'http'`` or
+    ``'browser'`` and ``response`` is the HTTP response (or None if the
+    request failed). ``headers`` are sent with the HTTP request. A 304 (to a
+    conditional GET), 404 or 410 is returned as is with ``via='http'``;
+    callers check ``response.status_code``.
+    """
+    from extraction import has_selector
+    try:
+        response = pool.session().get(url, headers=headers, timeout=timeout)
+    except Exception:
+        response = None
+    if response is not None:
+        if response.status_code in (304, 404, 410):
+            return response.text, 'http', response
+        if response.status_code == 200 and has_selector(response.text, selector):
+            return response.text, 'http', response
+    return render(pool.driver(), url, selector, timeout, scroll), 'browser', response
@@ -0,0 +1,187 @@
+"""Columnar, memory-mapped corpus store.
+
+``python corpus_store.py corpus_final_stemmed.csv`` converts a corpus CSV
+into one UTF-8 blob plus an offsets array per column. Columns are opened
+lazily with ``np.load(mmap_mode='r')``, so rendering ten results only reads
+those ten titles/urls/snippets instead of parsing every full-text body.
+"""
+import os
+import json
+import shutil
+import argparse
+import time
+import numpy as np
+
+from search_index import corpus_checksum, StaleIndexError
+
+FORMAT_VERSION = 1
+SNIPPET_CHARS = 200
+
+
+def default_store_dir(csv_path):
+    return os.path.splitext(csv_path)[0] + '_store'
+
+
+def make_snippet(text, n=SNIPPET_CHARS):
+    """Same preview render_results used to build from body_stemmed."""
+    return text[:n] + '...' if len(text) > n else text
+
+
+def convert_csv(csv_path, store_dir=None, snippet_from='body_stemmed'):
+    """Write every column of ``csv_path`` (plus a ``snippet`` column) to ``store_dir``.
+
+    Missing values are stored as empty strings. Returns the store directory.
+    """
+    import pandas as pd
+
+    store_dir = store_dir or default_store_dir(csv_path)
+    checksum = corpus_checksum(csv_path)
+    meta = {'source_path': os.path.abspath(csv_path), 'source_sha256': checksum}
+    return write_store(pd.read_csv(csv_path), store_dir, snippet_from, meta)
+
+
+def write_store(df, store_dir, snippet_from='body_stemmed', meta=None):
+    """Write the columns of DataFrame ``df`` (plus ``snippet``) as a store; returns ``store_dir``."""
+    df = df.fillna('').astype(str)
+    if snippet_from in df.columns:
+        df['snippet'] = df[snippet_from].map(make_snippet)
+
+    tmp_dir = store_dir.rstrip('/\\') + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for col in df.columns:
+        encoded = [v.encode('utf-8') for v in df[col]]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        with open(os.path.join(tmp_dir, f'{col}.bin'), 'wb') as fh:
+            fh.write(b''.join(encoded))
+        np.save(os.path.join(tmp_dir, f'{col}.offsets.npy'), offsets)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        **(meta or {}),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'n_docs': len(df),
+        'columns': list(df.columns),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh, indent=2)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.rename(tmp_dir, store_dir)
+    return store_dir
+
+
+class _Rows:
+    # frame/nunique on top of the subclass' get() and column()
+
+    def frame(self, ids, columns):
+        """DataFrame of ``columns`` for ``ids``, indexed by id like ``df.iloc[ids]``."""
+        import pandas as pd
+        ids = list(ids)
+        return pd.DataFrame({col: self.get(col, ids) for col in columns}, index=ids)
+
+    def nunique(self, col):
+        return len(set(self.column(col)))
+
+
+class CorpusStore(_Rows):
+    """Read-only view over a converted corpus; columns are memory-mapped on first use."""
+
+    def __init__(self, store_dir):
+        self.path = store_dir
+        with open(os.path.join(store_dir, 'meta.json'), encoding='utf-8') as fh:
+            self.meta = json.load(fh)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise StaleIndexError(f"store format {self.meta.get('format_version')} != {FORMAT_VERSION}")
+        self.columns = self.meta['columns']
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta['n_docs']
+
+    def _column(self, col):
+        if col not in self._columns:
+            if col not in self.columns:
+                raise KeyError(col)
+            offsets = np.load(os.path.join(self.path, f'{col}.offsets.npy'), mmap_mode='r')
+            blob_path = os.path.join(self.path, f'{col}.bin')
+            # np.memmap cannot map an empty file
+            blob = np.memmap(blob_path, dtype=np.uint8, mode='r') if offsets[-1] else np.zeros(0, np.uint8)
+            # plain ndarray views: slicing an np.memmap object is much slower
+            self._columns[col] = (np.asarray(offsets), np.asarray(blob))
+        return self._columns[col]
+
+    def get(self, col, ids):
+        """Values of ``col`` for the given positional ids."""
+        offsets, blob = self._column(col)
+        return [blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8') for i in ids]
+
+    def get_bytes(self, col, i, start=0, end=None):
+        """Bytes ``start:end`` of the UTF-8 value of ``col`` for document ``i``, without reading the rest."""
+        offsets, blob = self._column(col)
+        lo, hi = int(offsets[i]), int(offsets[i + 1])
+        return blob[lo + start:hi if end is None else min(hi, lo + end)].tobytes()
+
+    def size(self, col, i):
+        """Length in bytes of the UTF-8 value of ``col`` for document ``i``."""
+        offsets, _ = self._column(col)
+        return int(offsets[i + 1] - offsets[i])
+
+    def column(self, col):
+        """The whole column as a list (reads every value of that column only)."""
+        return self.get(col, range(len(self)))
+
+
+class SegmentedStore(_Rows):
+    """Several stores read as one, e.g. the segments of a search_index.SearchIndex.
+
+    Document ids run through the stores in order (store ``i`` starts at
+    ``offsets[i]``); ``live`` marks which ids are not deleted. Columns a
+    store does not have read as empty strings.
+    """
+
+    def __init__(self, stores, live=None):
+        self.stores = list(stores)
+        self.offsets = np.cumsum([0] + [len(s) for s in self.stores])
+        self.live = np.ones(self.offsets[-1], dtype=bool) if live is None else live
+        self.columns = list(dict.fromkeys(c for s in self.stores for c in s.columns))
+
+    def __len__(self):
+        """Number of live documents."""
+        return int(self.live.sum())
+
+    def get(self, col, ids):
+        ids = np.asarray(list(ids), dtype=np.int64)
+        which = np.searchsorted(self.offsets, ids, side='right') - 1
+        out = [''] * len(ids)
+        for i, store in enumerate(self.stores):
+            pos = np.flatnonzero(which == i)
+            if len(pos) and col in store.columns:
+                for p, value in zip(pos, store.get(col, ids[pos] - self.offsets[i])):
+                    out[p] = value
+        return out
+
+    def column(self, col):
+        """Values of ``col`` for the live documents, in id order."""
+        return self.get(col, np.flatnonzero(self.live))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert corpus CSV files into columnar memory-mapped stores')
+    parser.add_argument('csv', nargs='+', help='Corpus CSV file(s) to convert')
+    parser.add_argument('--out', '-o', help='Output directory (only with a single CSV; default <csv>_store)')
+    args = parser.parse_args()
+    if args.out and len(args.csv) > 1:
+        parser.error('--out can only be used with a single CSV')
+
+    for path in args.csv:
+        start = time.perf_counter()
+        out = convert_csv(path, args.out)
+        store = CorpusStore(out)
+        print(f"{path} -> {out}: {len(store)} docs, columns {store.columns} "
+              f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
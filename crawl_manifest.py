@@ -0,0 +1,100 @@
+"""Per-URL crawl manifest for incremental re-crawls.
+
+For every article URL the manifest keeps the ETag / Last-Modified headers,
+the last fetch time and a SHA-256 of the extracted ``title, body, date``.
+A re-crawl sends them back as ``If-None-Match`` / ``If-Modified-Since``;
+a 304, or a page whose extracted content hashes the same, counts as
+unchanged and is not emitted again. Only new or changed documents go
+downstream (preprocessing.py, search_index.py), and :func:`merge_corpus`
+folds them into the existing corpus CSV.
+"""
+import os
+import json
+import time
+import hashlib
+
+DEFAULT_MANIFEST = 'crawl_manifest.json'
+
+
+def content_hash(doc):
+    """SHA-256 of the extracted fields; markup, ads and scripts around them do not count."""
+    h = hashlib.sha256()
+    for field in ('title', 'body', 'date'):
+        h.update(str(doc.get(field, '')).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class CrawlManifest:
+    """``url -> {etag, last_modified, fetched_at, body_sha256}``, stored as JSON at ``path``."""
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                self.entries = json.load(fh)
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def conditional_headers(self, url):
+        """Request headers for a conditional GET of ``url`` (empty for unseen URLs)."""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def not_modified(self, url):
+        """Record a 304 answer for ``url``."""
+        self.entries[url]['fetched_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.counts['unchanged'] += 1
+
+    def record(self, url, doc, headers=None):
+        """Store a freshly fetched document; returns True if it is new or its content changed."""
+        headers = headers or {}
+        digest = content_hash(doc)
+        old = self.entries.get(url)
+        self.entries[url] = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'body_sha256': digest,
+        }
+        state = 'new' if old is None else 'changed' if old['body_sha256'] != digest else 'unchanged'
+        self.counts[state] += 1
+        return state != 'unchanged'
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.entries, fh, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def merge_corpus(corpus_csv, docs, output_csv=None):
+    """Replace rows of ``corpus_csv`` whose url is in ``docs`` and append the new ones.
+
+    Writes to ``output_csv`` (default: ``corpus_csv`` in place, atomically)
+    and returns the number of rows written.
+    """
+    import pandas as pd
+
+    output_csv = output_csv or corpus_csv
+    delta = pd.DataFrame(docs, columns=['url', 'title', 'body', 'date'])
+    if os.path.exists(corpus_csv):
+        old = pd.read_csv(corpus_csv)
+        merged = pd.concat([old[~old['url'].isin(delta['url'])], delta], ignore_index=True)
+    else:
+        merged = delta
+    tmp = output_csv + '.tmp'
+    merged.to_csv(tmp, index=False)
+    os.replace(tmp, output_csv)
+    return len(merged)
@@ -0,0 +1,278 @@
+"""Concurrent asyncio crawler for Kompasiana listing and article pages.
+
+Replaces the one-request-then-``time.sleep(1)`` loops in crawling1.py and
+scraping_isi.py. All requests go through one pooled ``aiohttp`` session;
+each host gets its own concurrency limit and token bucket, and failed
+requests (connection errors, 429, 5xx) are retried with exponential backoff.
+The output CSVs are the same as before (``url`` and ``url,title,body,date``).
+
+    python crawler.py links https://www.kompasiana.com/tag/dunia-kerja --max-pages 30
+    python crawler.py articles artikel_links_kompasiana_20251114_213427.csv corpus_isi_kompasiana.csv
+
+With ``--manifest crawl_manifest.json`` a re-crawl sends conditional GETs
+and only writes new or changed articles (see crawl_manifest.py).
+
+Nothing is tied to kompasiana.com, so the same code runs against a local
+``python -m http.server`` serving saved pages.
+"""
+import csv
+import time
+import random
+import asyncio
+import argparse
+import datetime
+from urllib.parse import urlsplit
+
+from crawl_manifest import CrawlManifest, merge_corpus
+from extraction import extract
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36"
+}
+KOMPASIANA_PREFIX = 'https://www.kompasiana.com/'
+ARTICLE_FIELDS = ['url', 'title', 'body', 'date']
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """``rate`` requests per second on average, bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Fetcher:
+    """Pooled HTTP client with per-host limits; use as ``async with Fetcher() as f``.
+
+    ``per_host`` requests run at once against a host and at most ``rate``
+    start per second. ``retries`` extra attempts are made on connection
+    errors, timeouts and RETRY_STATUS responses, sleeping ``backoff * 2**n``
+    seconds (plus jitter) in between.
+    """
+
+    def __init__(self, per_host=4, rate=4.0, retries=3, backoff=0.5, timeout=10, headers=HEADERS):
+        self.per_host = per_host
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers
+        self.session = None
+        self._hosts = {}
+
+    async def __aenter__(self):
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = (asyncio.Semaphore(self.per_host), TokenBucket(self.rate, self.per_host))
+        return self._hosts[host]
+
+    async def fetch(self, url, headers=None):
+        """``(status, text, response headers)`` of ``url`` after retries.
+
+        ``headers`` are sent with the request (e.g. conditional-GET headers).
+        Raises the last error if every attempt failed.
+        """
+        import aiohttp
+        semaphore, bucket = self._host(url)
+        for attempt in range(self.retries + 1):
+            error = None
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    async with self.session.get(url, headers=headers) as res:
+                        status, text, res_headers = res.status, await res.text(), res.headers
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+            if error is None and (status not in RETRY_STATUS or attempt == self.retries):
+                return status, text, res_headers
+            if error is not None and attempt == self.retries:
+                raise error
+            await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    async def get(self, url):
+        """``(status, text)`` of ``url``, see :meth:`fetch`."""
+        status, text, _ = await self.fetch(url)
+        return status, text
+
+
+def parse_listing(html, prefix=KOMPASIANA_PREFIX):
+    """Article links on a Kompasiana tag/category page (same selectors as crawling1.py)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    for artikel_div in soup.find_all('div', class_='artikel'):
+        konten = artikel_div.find('div', class_='artikel--content')
+        h2 = konten.find('h2') if konten else None
+        a = h2.find('a', href=True) if h2 else None
+        if a and a['href'].startswith(prefix):
+            links.append(a['href'])
+    return links
+
+
+def parse_article(html, url=None):
+    """``{'title', 'body', 'date'}`` of an article page (see extraction.py)."""
+    return extract(html, url)
+
+
+def _progress(total, desc):
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return None
+    return tqdm(total=total, desc=desc)
+
+
+async def crawl_links(base_url, max_pages=30, fetcher=None, prefix=KOMPASIANA_PREFIX):
+    """Article links from pages 1..max_pages of ``base_url``.
+
+    Pages are fetched ``fetcher.per_host`` at a time; like crawling1.py the
+    crawl stops at the first page that does not return 200.
+    """
+    if fetcher is None:
+        async with Fetcher() as fetcher:
+            return await crawl_links(base_url, max_pages, fetcher, prefix)
+    urls = [base_url if page == 1 else f"{base_url}?page={page}" for page in range(1, max_pages + 1)]
+    links = {}
+    for start in range(0, len(urls), fetcher.per_host):
+        batch = urls[start:start + fetcher.per_host]
+        responses = await asyncio.gather(*(fetcher.get(u) for u in batch), return_exceptions=True)
+        for page, (url, res) in enumerate(zip(batch, responses), start + 1):
+            if isinstance(res, Exception) or res[0] != 200:
+                reason = res if isinstance(res, Exception) else f"status: {res[0]}"
+                print(f"hentikan di page {page}, {reason}")
+                return list(links)
+            links.update(dict.fromkeys(parse_listing(res[1], prefix)))
+    return list(links)
+
+
+async def scrape_articles(urls, fetcher=None, manifest=None):
+    """Fetch and parse ``urls`` concurrently; returns article dicts in input order.
+
+    URLs that still fail (or answer non-200) after retries are reported and
+    left out. With a :class:`crawl_manifest.CrawlManifest` the requests are
+    conditional and only new or changed articles are returned; the caller
+    saves the manifest.
+    """
+    if fetcher is None:
+        async with Fetcher() as fetcher:
+            return await scrape_articles(urls, fetcher, manifest)
+    bar = _progress(len(urls), 'Scraping Isi Kompasiana')
+
+    async def one(url):
+        try:
+            headers = manifest.conditional_headers(url) if manifest is not None else None
+            status, html, res_headers = await fetcher.fetch(url, headers)
+            if status == 304 and manifest is not None and url in manifest:
+                manifest.not_modified(url)
+                return None
+            if status != 200:
+                print(f"Error scraping {url}: status {status}")
+                return None
+            doc = {'url': url, **parse_article(html, url)}
+            if manifest is not None and not manifest.record(url, doc, res_headers):
+                return None
+            return doc
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            return None
+        finally:
+            if bar is not None:
+                bar.update()
+
+    results = await asyncio.gather(*(one(u) for u in urls))
+    if bar is not None:
+        bar.close()
+    return [r for r in results if r is not None]
+
+
+def read_links(csv_file):
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        return [row['url'] for row in csv.DictReader(f)]
+
+
+def save_links(links, fname=None):
+    fname = fname or f"artikel_links_kompasiana_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv"
+    with open(fname, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['url'])
+        writer.writerows([link] for link in links)
+    print(f"{len(links)} link artikel berhasil disimpan ke {fname}")
+    return fname
+
+
+def save_articles(results, output_file):
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=ARTICLE_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"{len(results)} artikel berhasil disimpan ke {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent Kompasiana crawler')
+    parser.add_argument('--per-host', type=int, default=4, help='Concurrent requests per host')
+    parser.add_argument('--rate', type=float, default=4.0, help='Requests per second per host')
+    parser.add_argument('--retries', type=int, default=3, help='Retries on errors, 429 and 5xx')
+    sub = parser.add_subparsers(dest='command', required=True)
+    links = sub.add_parser('links', help='Collect article links from a tag/category page')
+    links.add_argument('base_url')
+    links.add_argument('--max-pages', type=int, default=30)
+    links.add_argument('--prefix', default=KOMPASIANA_PREFIX, help='Only keep links starting with this')
+    links.add_argument('--out', '-o', help='Output CSV (default artikel_links_kompasiana_<timestamp>.csv)')
+    articles = sub.add_parser('articles', help='Scrape url,title,body,date for a links CSV')
+    articles.add_argument('links_csv')
+    articles.add_argument('output', help='Output CSV (only new/changed articles with --manifest)')
+    articles.add_argument('--manifest', help='Crawl manifest for conditional re-crawls, e.g. crawl_manifest.json')
+    articles.add_argument('--merge-into', help='Also fold the new/changed articles into this corpus CSV')
+    args = parser.parse_args()
+
+    async def run():
+        async with Fetcher(args.per_host, args.rate, args.retries) as fetcher:
+            if args.command == 'links':
+                save_links(await crawl_links(args.base_url, args.max_pages, fetcher, args.prefix), args.out)
+            else:
+                manifest = CrawlManifest(args.manifest) if args.manifest else None
+                results = await scrape_articles(read_links(args.links_csv), fetcher, manifest)
+                save_articles(results, args.output)
+                if args.merge_into:
+                    n = merge_corpus(args.merge_into, results)
+                    print(f"{args.merge_into}: {n} artikel")
+                # only after the delta (and the merge) is written: otherwise a failure
+                # would leave the articles marked as crawled but missing from the corpus
+                if manifest is not None:
+                    manifest.save()
+                    print(f"baru {manifest.counts['new']}, berubah {manifest.counts['changed']}, "
+                          f"tidak berubah {manifest.counts['unchanged']}")
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    print(f"selesai dalam {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
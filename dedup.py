@@ -0,0 +1,243 @@
+"""Near-duplicate detection for merged corpora (MinHash + LSH).
+
+The same article is collected under several Talenta categories and
+syndicated pieces show up on more than one site, so a plain ``pd.concat``
+of the scraped corpora indexes them several times. Every document is
+reduced to its set of word ``k``-shingles, summarised by a MinHash
+signature, and LSH banding proposes candidate pairs in near-linear time:
+documents with identical shingle sets are collapsed into one representative
+first, and each member of a bucket is only paired with the bucket's first
+member. Candidates whose exact shingle Jaccard similarity reaches
+``threshold`` are clustered (union-find); the first document of a cluster
+is kept.
+
+    python dedup.py corpus_isi_talenta_stemmed.csv:talenta corpus_isi_kompasiana_stemmed.csv:kompasiana \\
+        -o corpus_final_stemmed.csv --report dedup_report.csv
+"""
+import argparse
+import zlib
+from collections import defaultdict
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+_token_hashes = {}
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """Sorted unique 64-bit hashes of the word ``k``-shingles of ``text`` (all words if shorter)."""
+    words = text.split()
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    ids = np.empty(len(words), dtype=np.uint64)
+    for i, w in enumerate(words):
+        h = _token_hashes.get(w)
+        if h is None:
+            h = _token_hashes[w] = zlib.crc32(w.encode('utf-8'))
+        ids[i] = h
+    k = min(k, len(words))
+    n = len(words) - k + 1
+    # polynomial combination of the k token hashes (uint64 arithmetic wraps)
+    shingles = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            shingles = shingles * np.uint64(1000003) + ids[j:j + n]
+    return np.unique(shingles)
+
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=1):
+    """``(n_docs, num_perm)`` uint32 MinHash signatures (multiply-shift hash family).
+
+    Documents without shingles get an all-max signature and never collide.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    sigs = np.full((len(shingle_sets), num_perm), 0xFFFFFFFF, dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for i, x in enumerate(shingle_sets):
+            if len(x):
+                h = (a[:, None] * x[None, :] + b[:, None]) >> np.uint64(32)
+                sigs[i] = (h & _MASK32).min(axis=1)
+    return sigs
+
+
+def lsh_params(threshold, num_perm=NUM_PERM):
+    """``(bands, rows)`` whose S-curve midpoint ``(1/bands)**(1/rows)`` is closest to ``threshold``."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+
+def candidate_pairs(sigs, bands, rows, ids=None):
+    """Pairs ``(first, other)`` of ids that share an LSH band bucket with the bucket's first member.
+
+    Each member is paired with one representative only, never with every
+    other member, so a bucket of m documents costs m - 1 pairs instead of
+    m(m - 1)/2. ``ids`` (default ``range(len(sigs))``) names the rows of ``sigs``.
+    """
+    ids = range(len(sigs)) if ids is None else ids
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        block = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows])
+        for i, key in zip(ids, map(bytes, block)):
+            first = buckets.setdefault(key, i)
+            if first != i:
+                pairs.add((first, i))
+    return pairs
+
+
+def jaccard(x, y):
+    """Exact Jaccard similarity of two sorted unique hash arrays."""
+    if not len(x) and not len(y):
+        return 1.0
+    inter = len(np.intersect1d(x, y, assume_unique=True))
+    return inter / (len(x) + len(y) - inter)
+
+
+def near_duplicate_clusters(texts, threshold=DEFAULT_THRESHOLD, k=SHINGLE_SIZE, num_perm=NUM_PERM):
+    """Clusters of near-duplicate documents as lists of positions, smallest (kept) first.
+
+    Returns ``(clusters, similarity)`` where ``similarity[(i, j)]`` is the
+    Jaccard similarity of each verified pair. Empty texts are never clustered.
+    """
+    shingle_sets = [shingle_hashes(t, k) for t in texts]
+    parent = list(range(len(texts)))
+    similarity = {}
+    # documents with identical shingle sets join their first occurrence directly;
+    # only these representatives go through MinHash / LSH
+    first_of = {}
+    reps = []
+    for i, x in enumerate(shingle_sets):
+        if not len(x):
+            continue
+        rep = first_of.setdefault(x.tobytes(), i)
+        if rep == i:
+            reps.append(i)
+        else:
+            parent[i] = rep
+            similarity[(rep, i)] = 1.0
+    sigs = minhash_signatures([shingle_sets[i] for i in reps], num_perm)
+    bands, rows = lsh_params(threshold, num_perm)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in sorted(candidate_pairs(sigs, bands, rows, reps)):
+        if find(i) == find(j):
+            continue
+        sim = jaccard(shingle_sets[i], shingle_sets[j])
+        if sim >= threshold:
+            similarity[(i, j)] = sim
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+    groups = defaultdict(list)
+    for i in range(len(texts)):
+        groups[find(i)].append(i)
+    return [g for g in groups.values() if len(g) > 1], similarity
+
+
+def dedup_text(df, text_column=None):
+    """Text to shingle: ``body_stemmed`` if present, else the cleaned ``body``."""
+    if text_column is None:
+        text_column = 'body_stemmed' if 'body_stemmed' in df.columns else 'body'
+    texts = df[text_column].fillna('').astype(str)
+    if text_column != 'body_stemmed':
+        from preprocessing import clean_text
+        texts = texts.map(clean_text)
+    return texts.tolist()
+
+
+def dedup_frame(df, threshold=DEFAULT_THRESHOLD, text_column=None, k=SHINGLE_SIZE, num_perm=NUM_PERM):
+    """Drop repeated urls and near-duplicate documents from ``df``.
+
+    Returns ``(kept, report)``; ``report`` has one row per removed document
+    with the url it duplicates, the reason (``url`` or ``near-duplicate``)
+    and the Jaccard similarity to the kept document.
+    """
+    import pandas as pd
+
+    df = df.reset_index(drop=True)
+    rows = []
+    if 'url' in df.columns:
+        first = df.drop_duplicates('url')
+        for i in df.index.difference(first.index):
+            rows.append({'cluster': None, 'kept_url': df.at[i, 'url'], 'removed_url': df.at[i, 'url'],
+                         'reason': 'url', 'similarity': 1.0})
+        df = first.reset_index(drop=True)
+
+    texts = dedup_text(df, text_column)
+    clusters, similarity = near_duplicate_clusters(texts, threshold, k, num_perm)
+    removed = []
+    for c, members in enumerate(clusters):
+        keep = members[0]
+        for i in members[1:]:
+            sim = similarity.get((keep, i))
+            if sim is None:
+                # only linked through another member; report the real similarity to the kept doc
+                sim = jaccard(shingle_hashes(texts[keep], k), shingle_hashes(texts[i], k))
+            rows.append({'cluster': c, 'kept_url': df.at[keep, 'url'] if 'url' in df else keep,
+                         'removed_url': df.at[i, 'url'] if 'url' in df else i,
+                         'reason': 'near-duplicate', 'similarity': round(sim, 4)})
+            removed.append(i)
+    report = pd.DataFrame(rows, columns=['cluster', 'kept_url', 'removed_url', 'reason', 'similarity'])
+    return df.drop(index=removed).reset_index(drop=True), report
+
+
+def merge_corpora(sources, output_csv, threshold=DEFAULT_THRESHOLD, report_csv=None, text_column=None):
+    """Concatenate ``[(csv_path, sumber or None), ...]``, deduplicate and write ``output_csv``.
+
+    Earlier sources win when documents collide. Returns ``(kept, report)``.
+    """
+    import pandas as pd
+
+    frames = []
+    for path, sumber in sources:
+        df = pd.read_csv(path)
+        if sumber:
+            df['sumber'] = sumber
+        frames.append(df)
+    merged = pd.concat(frames, ignore_index=True)
+    kept, report = dedup_frame(merged, threshold, text_column)
+    kept.to_csv(output_csv, index=False)
+    if report_csv:
+        report.to_csv(report_csv, index=False)
+    return kept, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge corpus CSVs and drop near-duplicate documents')
+    parser.add_argument('sources', nargs='+', help="Corpus CSVs, optionally as path:sumber (e.g. a.csv:talenta)")
+    parser.add_argument('--output', '-o', required=True, help='Merged, deduplicated CSV')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Jaccard similarity of word shingles at which documents count as duplicates')
+    parser.add_argument('--report', help='CSV listing every removed document')
+    parser.add_argument('--text-column', help='Column to compare (default body_stemmed, else body)')
+    args = parser.parse_args()
+
+    sources = []
+    for s in args.sources:
+        path, _, sumber = s.rpartition(':')
+        sources.append((path, sumber) if path and sumber.isalnum() else (s, None))
+    kept, report = merge_corpora(sources, args.output, args.threshold, args.report, args.text_column)
+    near = report[report['reason'] == 'near-duplicate']
+    print(f"{len(kept)} dokumen ke {args.output}; dihapus {len(report)} "
+          f"({(report['reason'] == 'url').sum()} url sama, {len(near)} near-duplicate "
+          f"dalam {near['cluster'].nunique()} cluster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Optional semantic retrieval: LSA vectors served through an IVF index.
+
+Lexical matching misses paraphrases ('upah' vs 'gaji'). Latent semantic
+analysis (a truncated SVD of the TF-IDF matrix ``X``) maps documents and
+queries into ``dims`` dimensions where terms that occur in similar contexts
+end up close, so a query can match documents that share none of its words.
+Everything runs on the CPU with scikit-learn; there is no model to download.
+
+Document vectors are stored L2-normalised as float16, or as int8 with one
+float32 scale per vector (int8 is also the faster one: NumPy decodes
+float16 slowly). An inverted-file (IVF) index clusters them with
+spherical k-means into ``nlist`` lists stored contiguously; a query only
+scores the ``nprobe`` lists whose centroids are closest to it. ``nprobe``
+trades recall for latency (``nprobe >= nlist`` scans every stored vector in
+one pass). IVF only pays off on large collections: on the 726-document
+corpus an exact scan is faster than probing 8 lists and loses nothing, so
+below EXACT_BELOW documents the index is built as a single list.
+``python benchmark.py --dense`` measures recall@10 and latency against
+exact float32 cosine.
+
+The vectors belong to one index generation (doc ids change on merge), so
+they are rebuilt after ``search_index.py add/delete/merge``:
+
+    python dense.py build --dims 128 --dtype int8
+    index/dense/<version>/   components, centroids, list offsets, doc ids, codes, scales
+"""
+import os
+import json
+import shutil
+import argparse
+import time
+import numpy as np
+
+from ranking import top_k
+from tracing import span
+
+DENSE_DIR = 'dense'
+DEFAULT_DIMS = 128
+DEFAULT_NPROBE = 8
+DTYPES = ('float16', 'int8')
+KMEANS_ITERATIONS = 20
+# below about this many vectors one exact scan is as fast as probing IVF lists
+EXACT_BELOW = 2000
+ARRAYS = ('components', 'centroids', 'offsets', 'ids', 'codes', 'scales')
+
+
+def lsa_components(X, dims=DEFAULT_DIMS, seed=0):
+    """``(dims, n_terms)`` float32 projection of TF-IDF rows onto their top singular directions."""
+    from sklearn.decomposition import TruncatedSVD
+    dims = max(1, min(dims, X.shape[0] - 1, X.shape[1] - 1))
+    svd = TruncatedSVD(n_components=dims, algorithm='randomized', random_state=seed)
+    svd.fit(X)
+    return svd.components_.astype(np.float32)
+
+
+def embed(X, components):
+    """L2-normalised float32 vectors of the rows of ``X`` (all-zero rows stay zero)."""
+    V = np.asarray(X @ components.T, dtype=np.float32)
+    norms = np.linalg.norm(V, axis=1, keepdims=True)
+    return np.divide(V, norms, out=np.zeros_like(V), where=norms > 0)
+
+
+def quantize(V, dtype):
+    """``(codes, scales)``: float16 copies (scales of 1), or int8 with a symmetric per-vector scale."""
+    if dtype == 'float16':
+        return V.astype(np.float16), np.ones(len(V), dtype=np.float32)
+    if dtype != 'int8':
+        raise ValueError(f"unknown dtype {dtype!r}, expected one of {DTYPES}")
+    top = np.abs(V).max(axis=1)
+    scales = np.where(top > 0, top / 127, 1.0).astype(np.float32)
+    return np.round(V / scales[:, None]).astype(np.int8), scales
+
+
+def spherical_kmeans(V, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """``(centroids, assignment)`` of unit vectors ``V`` by cosine k-means.
+
+    Starts from randomly picked *distinct* vectors: with duplicated
+    documents, equal starting centroids would leave lists empty. Returns
+    fewer than ``nlist`` centroids when there are fewer distinct vectors.
+    """
+    rng = np.random.default_rng(seed)
+    distinct = np.unique(V, axis=0)
+    centroids = distinct[rng.choice(len(distinct), size=min(nlist, len(distinct)), replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(V @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, V)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # an emptied list keeps its old centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32), np.argmax(V @ centroids.T, axis=1)
+
+
+class DenseIndex:
+    """LSA vectors of one index generation in an IVF layout.
+
+    List ``c`` holds the documents ``ids[offsets[c]:offsets[c + 1]]`` with
+    their ``codes``/``scales`` at the same positions. Documents with an
+    empty vector (tombstoned or without indexed terms) are left out.
+    """
+
+    def __init__(self, tfidf, components, centroids, offsets, ids, codes, scales, nprobe=DEFAULT_NPROBE):
+        self.tfidf = tfidf
+        self.components = components
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.codes = codes
+        self.scales = scales
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, X, tfidf, dims=DEFAULT_DIMS, nlist=None, dtype='int8', nprobe=DEFAULT_NPROBE, seed=0):
+        """Fit LSA on the TF-IDF matrix ``X`` and cluster its rows; ``tfidf`` (ranking.TfidfEngine) embeds queries.
+
+        ``nlist`` defaults to about ``sqrt(n_docs)`` lists, or a single list
+        (exact search) below EXACT_BELOW documents.
+        """
+        components = lsa_components(X, dims, seed)
+        V = embed(X, components)
+        doc_ids = np.flatnonzero(np.abs(V).sum(axis=1) > 0)
+        V = V[doc_ids]
+        if nlist is None:
+            nlist = 1 if len(V) < EXACT_BELOW else int(round(np.sqrt(len(V))))
+        nlist = max(1, min(nlist, len(V)))
+        centroids, assign = spherical_kmeans(V, nlist, seed=seed)
+        order = np.argsort(assign, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=len(centroids))))).astype(np.int64)
+        codes, scales = quantize(V[order], dtype)
+        return cls(tfidf, components, centroids, offsets, doc_ids[order].astype(np.int32), codes, scales, nprobe)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def nbytes(self):
+        """Size of the document vectors as stored (codes and scales)."""
+        return self.codes.nbytes + self.scales.nbytes
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as fh:
+            json.dump({'dims': int(self.components.shape[0]), 'nlist': self.nlist, 'nprobe': self.nprobe,
+                       'dtype': str(self.codes.dtype), 'n_docs': len(self.ids)}, fh)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, tfidf):
+        """Memory-mapped vectors saved at ``path``, or None if there are none."""
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as fh:
+            meta = json.load(fh)
+        arrays = [np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')) for name in ARRAYS]
+        return cls(tfidf, *arrays, nprobe=meta['nprobe'])
+
+    def query_vector(self, query):
+        """Unit LSA vector of an analyzed query string (zeros if it has no indexed term)."""
+        return embed(self.tfidf.query_vector(query), self.components)[0]
+
+    def search(self, q, k=10, nprobe=None):
+        """``(doc_ids, cosine scores)`` of the k best documents in the ``nprobe`` lists closest to ``q``."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        if not q.any() or k <= 0:
+            return top_k(np.zeros(0), 0)
+        if nprobe >= self.nlist:
+            # every list: one pass over the contiguous codes, no centroid scoring or concatenation
+            return top_k((self.codes.astype(np.float32) @ q) * self.scales, k, self.ids)
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        spans = [slice(self.offsets[c], self.offsets[c + 1]) for c in np.sort(probe)]
+        # list by list: only the scores are concatenated, not the codes
+        scores = np.concatenate([(self.codes[s].astype(np.float32) @ q) * self.scales[s] for s in spans])
+        return top_k(scores, k, np.concatenate([self.ids[s] for s in spans]))
+
+    def top_k(self, query, k=10, nprobe=None):
+        """Like the lexical engines' top_k; ``query`` is the list of analyzed tokens."""
+        with span('vectorize'):
+            q = self.query_vector(' '.join(query))
+        with span('score'):
+            return self.search(q, k, nprobe)
+
+
+def dense_path(index_dir, version):
+    return os.path.join(index_dir, DENSE_DIR, version)
+
+
+def build_dense(index_dir='index', version=None, dims=DEFAULT_DIMS, nlist=None, dtype='int8',
+                nprobe=DEFAULT_NPROBE):
+    """Build and save the dense index of a generation (default CURRENT); drops those of vanished generations."""
+    from search_index import SearchIndex
+    index = SearchIndex(index_dir, version)
+    dense = DenseIndex.build(index.X, index.tfidf(), dims, nlist, dtype, nprobe)
+    dense.save(dense_path(index_dir, index.version))
+    root = os.path.join(index_dir, DENSE_DIR)
+    for name in os.listdir(root):
+        if name != index.version and not os.path.exists(os.path.join(index_dir, 'manifests', f'{name}.json')):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return index.version, dense
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the optional LSA + IVF semantic index')
+    parser.add_argument('command', nargs='?', default='build', choices=['build'])
+    parser.add_argument('--index-dir', default='index', help='Index directory (see search_index.py)')
+    parser.add_argument('--dims', type=int, default=DEFAULT_DIMS, help='LSA dimensions')
+    parser.add_argument('--nlist', type=int,
+                        help=f'IVF lists (default about sqrt(n_docs); 1, exact search, below {EXACT_BELOW} docs)')
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help='Lists scored per query by default')
+    parser.add_argument('--dtype', choices=DTYPES, default='int8', help='Storage type of the vectors')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, dense = build_dense(args.index_dir, None, args.dims, args.nlist, args.dtype, args.nprobe)
+    print(f"Dense index {version} ({time.perf_counter() - start:.2f}s): {len(dense.ids)} vektor x "
+          f"{dense.components.shape[0]} dim {dense.codes.dtype} ({dense.nbytes / 1024:.0f} KiB), "
+          f"{dense.nlist} list, nprobe {dense.nprobe}")
+
+
+if __name__ == '__main__':
+    main()
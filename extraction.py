@@ -0,0 +1,214 @@
+"""Article extraction from raw HTML with a pluggable parser backend.
+
+The scrapers used to build a ``BeautifulSoup(html, 'html.parser')`` tree for
+every page and then probe the content selectors one by one. Here the rules
+for each site are declared once as CSS selectors (:data:`RULES`) and run on
+the fastest parser that is installed:
+
+    selectolax (lexbor)  >  lxml  >  BeautifulSoup html.parser
+
+All backends return the same ``{'title', 'body', 'date'}`` fields as the old
+code: the text of the first ``<h1>``, the ``<p>`` texts of the first
+matching content container joined by newlines (each
+``get_text(' ', strip=True)``) and the text of the first ``<time>``.
+``<script>``, ``<style>`` and ``<noscript>`` elements are removed first in
+every backend (bs4's get_text skips script and style text on its own,
+selectolax and lxml would keep it).
+"""
+from urllib.parse import urlsplit
+
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+# never article text, even inside a <p>
+STRIPPED_TAGS = ('script', 'style', 'noscript')
+
+
+class SiteRule:
+    """Where title, body paragraphs and date live on one site's article pages.
+
+    ``content`` selectors are tried in order; the first one that matches is
+    the body container.
+    """
+
+    def __init__(self, content, title='h1', paragraphs='p', date='time'):
+        self.content = list(content)
+        self.title = title
+        self.paragraphs = paragraphs
+        self.date = date
+
+
+KOMPASIANA = SiteRule(['div.read__content', 'div.content-detail', 'div[itemprop="articleBody"]',
+                       'div.post-content'])
+TALENTA = SiteRule(['article'])
+RULES = {
+    'www.kompasiana.com': KOMPASIANA,
+    'www.talenta.co': TALENTA,
+}
+DEFAULT_RULE = KOMPASIANA
+
+
+def rule_for(url):
+    """:class:`SiteRule` for ``url``'s host (DEFAULT_RULE for unknown hosts)."""
+    return RULES.get(urlsplit(url or '').netloc, DEFAULT_RULE)
+
+
+def _clean(strings, separator):
+    # get_text(separator, strip=True): strip every text node and drop the empty ones
+    return separator.join(s for s in (s.strip() for s in strings) if s)
+
+
+class _SelectolaxBackend:
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parse = LexborHTMLParser
+
+    @staticmethod
+    def strip(tree, tags):
+        tree.strip_tags(list(tags))
+
+    @staticmethod
+    def first(tree, selector):
+        return tree.css_first(selector)
+
+    @staticmethod
+    def all(node, selector):
+        return node.css(selector)
+
+    @staticmethod
+    def text(node, separator=''):
+        return _clean(node.text(deep=True, separator='\0').split('\0'), separator)
+
+
+class _LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._parse = lxml.html.document_fromstring
+        self._compiled = {}
+        self._CSSSelector = CSSSelector
+
+    def parse(self, html):
+        html = html or '<html></html>'
+        try:
+            return self._parse(html)
+        except ValueError:
+            # str with an <?xml encoding=...?> declaration
+            return self._parse(html.encode('utf-8'))
+
+    @staticmethod
+    def strip(tree, tags):
+        for node in list(tree.iter(*tags)):
+            # keeps the text that follows the element
+            node.drop_tree()
+
+    def _selector(self, selector):
+        # compiled to XPath once per selector, not once per page
+        if selector not in self._compiled:
+            self._compiled[selector] = self._CSSSelector(selector)
+        return self._compiled[selector]
+
+    def first(self, tree, selector):
+        found = self._selector(selector)(tree)
+        return found[0] if found else None
+
+    def all(self, node, selector):
+        return self._selector(selector)(node)
+
+    @staticmethod
+    def text(node, separator=''):
+        return _clean(node.xpath('.//text()'), separator)
+
+
+class _SoupBackend:
+    name = 'html.parser'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def parse(self, html):
+        return self._soup(html, 'html.parser')
+
+    @staticmethod
+    def strip(tree, tags):
+        for node in tree.find_all(tags):
+            node.decompose()
+
+    @staticmethod
+    def first(tree, selector):
+        return tree.select_one(selector)
+
+    @staticmethod
+    def all(node, selector):
+        return node.select(selector)
+
+    @staticmethod
+    def text(node, separator=''):
+        return node.get_text(separator, strip=True)
+
+
+_BACKEND_CLASSES = {
+    'selectolax': _SelectolaxBackend,
+    'lxml': _LxmlBackend,
+    'html.parser': _SoupBackend,
+}
+_backends = {}
+
+
+def get_backend(name=None):
+    """Backend by name, or the first importable one in :data:`BACKENDS` order."""
+    for candidate in ([name] if name else BACKENDS):
+        if candidate not in _backends:
+            try:
+                _backends[candidate] = _BACKEND_CLASSES[candidate]()
+            except ImportError:
+                if name:
+                    raise
+                continue
+        return _backends[candidate]
+    raise ImportError('no HTML parser available (install selectolax, lxml or beautifulsoup4)')
+
+
+def available_backends():
+    names = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def extract(html, url=None, rule=None, backend=None):
+    """``{'title', 'body', 'date'}`` of an article page.
+
+    ``rule`` defaults to the rule for ``url``'s host; ``backend`` is a
+    backend name or object (default: fastest installed).
+    """
+    rule = rule or rule_for(url)
+    backend = backend if hasattr(backend, 'parse') else get_backend(backend)
+    tree = backend.parse(html)
+    backend.strip(tree, STRIPPED_TAGS)
+    title = backend.first(tree, rule.title)
+    content = None
+    for selector in rule.content:
+        content = backend.first(tree, selector)
+        if content is not None:
+            break
+    date = backend.first(tree, rule.date)
+    return {
+        'title': backend.text(title) if title is not None else '',
+        'body': '\n'.join(backend.text(p, ' ') for p in backend.all(content, rule.paragraphs))
+                if content is not None else '',
+        'date': backend.text(date) if date is not None else '',
+    }
+
+
+def has_selector(html, selector, backend=None):
+    """Whether ``selector`` matches anything in ``html``."""
+    backend = backend if hasattr(backend, 'parse') else get_backend(backend)
+    return backend.first(backend.parse(html), selector) is not None
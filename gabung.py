@@ -1,7 +1,8 @@
-import pandas as pd
+from dedup import merge_corpora
 
 files = ['corpus_isi_kompasiana.csv', 'corpus_kerja_crawler_20251114_211341.csv']
-dfs = [pd.read_csv(f) for f in files]
-final = pd.concat(dfs, ignore_index=True)
-final.to_csv('corpus_dokumen_final.csv', index=False)
+# concat + buang url ganda dan artikel near-duplicate (lihat dedup.py)
+final, report = merge_corpora([(f, None) for f in files], 'corpus_dokumen_final.csv',
+                              report_csv='dedup_report.csv')
 print("Total dokumen:", len(final))
+print("Duplikat dihapus:", len(report), "(detail di dedup_report.csv)")
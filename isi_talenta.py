@@ -1,53 +1,59 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 import csv
-import time
+from crawl_manifest import CrawlManifest, merge_corpus
+from browser_pool import BrowserPool, fetch_page
+from extraction import extract, TALENTA
 
-options = Options()
-options.add_argument("--headless")
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# halaman dianggap lengkap kalau <article> sudah berisi paragraf
+ARTICLE_SELECTOR = "article p"
 
-def scrape_articles_from_csv_selenium(csv_file, output_file):
+def parse_talenta_article(html):
+    # judul <h1>, paragraf di dalam <article>, tanggal <time> (lihat extraction.TALENTA)
+    return extract(html, rule=TALENTA)
+
+def scrape_one(pool, job):
+    url, headers = job
+    try:
+        # HTTP dulu (conditional GET), browser hanya kalau <article> kosong
+        html, via, response = fetch_page(pool, url, ARTICLE_SELECTOR, headers)
+        if via == 'http' and response.status_code == 304:
+            return url, None, via, None
+        if via == 'http' and response.status_code != 200:
+            print(f"Error scraping {url}: status {response.status_code}")
+            return url, None, None, None
+        doc = {"url": url, **parse_talenta_article(html)}
+        return url, doc, via, response.headers if via == 'http' else None
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return url, None, None, None
+
+def scrape_articles_from_csv_selenium(csv_file, output_file, manifest_file="crawl_manifest_talenta.json", workers=4):
+    # manifest: hanya artikel baru/berubah yang ditulis ulang ke output_file
+    manifest = CrawlManifest(manifest_file)
     results = []
+    via_count = {'http': 0, 'browser': 0}
     with open(csv_file, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         urls = [row['url'] for row in reader]
-    for url in tqdm(urls, desc="Scraping Isi Talenta (Selenium)"):
-        try:
-            driver.get(url)
-            time.sleep(3)  # Tunggu JS render
-
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Judul dari <h1>
-            title_tag = soup.find('h1')
-            title = title_tag.get_text(strip=True) if title_tag else ""
-            
-            # Konten utama dari <article>
-            body = ""
-            article_tag = soup.find('article')
-            if article_tag:
-                paragraphs = article_tag.find_all('p')
-                body = "\n".join([p.get_text(" ", strip=True) for p in paragraphs])
-
-            date_tag = soup.find('time')
-            date = date_tag.get_text(strip=True) if date_tag else ""
-
-            results.append({"url": url, "title": title, "body": body, "date": date})
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"Error scraping {url}: {e}")
+    jobs = [(url, manifest.conditional_headers(url)) for url in urls]
+    with BrowserPool(workers) as pool:
+        for url, doc, via, headers in tqdm(pool.map(scrape_one, jobs), total=len(jobs),
+                                           desc="Scraping Isi Talenta"):
+            if via:
+                via_count[via] += 1
+            if doc is None:
+                if via == 'http' and url in manifest:
+                    manifest.not_modified(url)
+                continue
+            if manifest.record(url, doc, headers):
+                results.append(doc)
 
-    with open(output_file, "w", newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['url', 'title', 'body', 'date'])
-        writer.writeheader()
-        writer.writerows(results)
-    print(f"Selesai scraping {len(results)} artikel, hasil: {output_file}")
-    driver.quit()
+    total = merge_corpus(output_file, results)
+    # after the merge: a failed merge must not leave the articles marked as crawled
+    manifest.save()
+    print(f"Selesai scraping: {manifest.counts['new']} baru, {manifest.counts['changed']} berubah, "
+          f"{manifest.counts['unchanged']} tidak berubah; {total} artikel di {output_file} "
+          f"({via_count['http']} via HTTP, {via_count['browser']} via browser)")
 
 if __name__ == "__main__":
     input_csv = "artikel_links_talenta_all_kategori_20251114_224627.csv"  # ganti dengan file link kamu
@@ -1,20 +1,9 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 from tqdm import tqdm
-import time
 import csv
 import datetime
 import re
-
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+from browser_pool import BrowserPool, fetch_page
 
 # Daftar kategori Talenta relevant kategori dunia kerja dan produktivitas
 categories = [
@@ -30,24 +19,30 @@ categories = [
     "recruitment-selection"
 ]
 
-def crawl_links_from_category(category, max_pages=10):
+# halaman kategori dianggap siap kalau daftar artikel (<article>) sudah ada
+LISTING_SELECTOR = "article a[href]"
+
+def extract_links(html):
+    soup = BeautifulSoup(html, "html.parser")
+    links = set()
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if (
+            href.startswith("https://www.talenta.co/blog/")
+            and re.match(r'^https://www\.talenta\.co/blog/[^/]+/$', href)
+            and 'category' not in href and 'tag' not in href and 'author' not in href and 'all' not in href
+        ):
+            links.add(href)
+    return links
+
+def crawl_links_from_category(pool, category, max_pages=10):
     base_url = f"https://www.talenta.co/blog/category/{category}/"
     links = set()
-    for page in tqdm(range(1, max_pages+1), desc=f"Crawling {category}"):
+    for page in range(1, max_pages+1):
         url = base_url if page == 1 else f"{base_url}page/{page}/"
-        driver.get(url)
-        time.sleep(2)
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if (
-                href.startswith("https://www.talenta.co/blog/")
-                and re.match(r'^https://www\.talenta\.co/blog/[^/]+/$', href)
-                and 'category' not in href and 'tag' not in href and 'author' not in href and 'all' not in href
-            ):
-                links.add(href)
+        # HTTP dulu; browser (tunggu selector + scroll) hanya kalau link belum ada di HTML
+        html, _, _ = fetch_page(pool, url, LISTING_SELECTOR, scroll=True)
+        links.update(extract_links(html))
         if len(links) == 0 and page == 1:
             print(f"Tidak ditemukan artikel kategori {category} di halaman {page}")
             break
@@ -55,9 +50,11 @@ def crawl_links_from_category(category, max_pages=10):
 
 if __name__ == "__main__":
     all_links = set()
-    for cat in categories:
-        cat_links = crawl_links_from_category(cat, max_pages=10)
-        all_links.update(cat_links)
+    # satu kategori per worker, tiap worker memakai browser-nya sendiri
+    with BrowserPool(4) as pool:
+        results = pool.map(lambda p, cat: crawl_links_from_category(p, cat, max_pages=10), categories)
+        for cat_links in tqdm(results, total=len(categories), desc="Crawling kategori"):
+            all_links.update(cat_links)
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"artikel_links_talenta_all_kategori_{ts}.csv"
     with open(filename, "w", newline="", encoding="utf-8") as f:
@@ -66,4 +63,3 @@ if __name__ == "__main__":
         for link in all_links:
             writer.writerow([link])
     print(f"Total {len(all_links)} link artikel dari {len(categories)} kategori berhasil disimpan ke {filename}")
-    driver.quit()
@@ -9,31 +9,6 @@ import seaborn as sns
 from scipy.stats import spearmanr 
 
 
-def read_titles(path):
-    """Read the `title` column from a result CSV."""
-    try:
-        df = pd.read_csv(path)
-        if 'title' not in df.columns:
-            raise ValueError(f"file {path} does not contain 'title' column")
-        return df['title'].astype(str).tolist()
-    except Exception:
-        # fallback parser: split each line into 5 fields only
-        titles = []
-        with open(path, encoding='utf-8', errors='replace') as fh:
-            header = fh.readline()
-            for i, line in enumerate(fh, start=2):
-                parts = line.rstrip('\n').split(',', 4)
-                if len(parts) < 1:
-                    continue
-                while len(parts) < 5:
-                    parts.append('')
-                title = parts[0].strip().strip('"')
-                titles.append(title)
-        if not titles:
-            raise ValueError(f"file {path} could not be parsed (no titles found)")
-        return titles
-
-
 def read_df(path):
     """Read CSV into DataFrame with columns: title, body_stemmed, sumber, url, relevan."""
     cols = ['title', 'body_stemmed', 'sumber', 'url', 'relevan']
@@ -71,35 +46,98 @@ def calculate_overlap(titles_a, titles_b, k):
     set_b = set(titles_b[:k])
     return len(set_a.intersection(set_b))
 
+# saved result CSVs are named <prefix><topic>.csv
+RESULT_PREFIXES = {'TF-IDF': 'results_tfidf_', 'BM25': 'results_bm25_', 'Hybrid': 'results_hybrid_'}
+
+
+def _result_files(results_dir):
+    """``{model: {topic: path}}`` of the result CSVs in ``results_dir``."""
+    files = {}
+    for model, prefix in RESULT_PREFIXES.items():
+        paths = glob.glob(os.path.join(results_dir, f'{prefix}*.csv'))
+        files[model] = {os.path.basename(p)[len(prefix):-len('.csv')]: p for p in paths}
+    return files
+
+
 def find_and_compare(results_dir='.', out_dir='plots'):
-    tfidf_files = glob.glob(os.path.join(results_dir, 'results_tfidf_*.csv'))
-    bm25_files = glob.glob(os.path.join(results_dir, 'results_bm25_*.csv'))
+    files = _result_files(results_dir)
+    common_topics = sorted(set(files['TF-IDF']) & set(files['BM25']))
+    # a hybrid CSV is compared too when one was saved for the topic
+    results = {t: {model: read_df(paths[t]) for model, paths in files.items() if t in paths}
+               for t in common_topics}
+    return compare_results(results, out_dir)
+
+
+def load_judgments(results_dir='.'):
+    """Relevant URLs per topic, taken from the hand-labelled `relevan` column of the result CSVs."""
+    judgments = {}
+    for path_map in _result_files(results_dir).values():
+        for t, path in path_map.items():
+            df = read_df(path)
+            judgments.setdefault(t, set()).update(df.loc[df['relevan'] == 1, 'url'].dropna().astype(str))
+    return judgments
+
+
+def label_results(df, relevant_urls):
+    """Add a `relevan` column (1/0) to a search result frame from a set of relevant URLs."""
+    df = df.copy()
+    df['relevan'] = df['url'].astype(str).isin(relevant_urls).astype(int)
+    return df
 
-    tf_map = {os.path.basename(p).replace('results_tfidf_','').replace('.csv',''): p for p in tfidf_files}
-    bm_map = {os.path.basename(p).replace('results_bm25_','').replace('.csv',''): p for p in bm25_files}
 
-    common_topics = sorted(list(set(tf_map.keys()) & set(bm_map.keys())))
+def compare_live(queries=None, results_dir='.', out_dir='plots', index_dir='index',
+                 corpus='corpus_final_stemmed.csv'):
+    """Re-run the queries against the current index with one batch search and compare them directly.
+
+    Relevance labels come from the existing result CSVs (see load_judgments);
+    by default every judged topic is re-run.
+    """
+    from search_index import load_index
+    from search import batch_search
+
+    judgments = load_judgments(results_dir)
+    if queries is None:
+        queries = [t.replace('_', ' ') for t in sorted(judgments)]
+    index = load_index(index_dir, corpus)
+    # doc ids follow the index segments, not the corpus CSV rows
+    hits = batch_search(queries, index.tfidf(), index.bm25(), index.documents())
+    results = {}
+    for q in queries:
+        topic = q.replace(' ', '_')
+        relevant = judgments.get(topic, set())
+        results[topic] = {model: label_results(frame, relevant) for model, frame in hits[q].items()}
+    return compare_results(results, out_dir)
+
+
+def compare_results(results, out_dir='plots'):
+    """Overlap, precision/recall/F1 and confusion plots for ``{topic: {'TF-IDF': df, 'BM25': df, ...}}``.
+
+    Each frame needs `title`, `url` and `relevan` columns. Overlap@k is
+    TF-IDF vs BM25; every model present (e.g. 'Hybrid') gets metrics and a
+    confusion matrix.
+    """
     summaries = []
     combined_rows = []
     confusion_paths = []
 
-    for t in common_topics:
-        df_tfidf = read_df(tf_map[t])
-        df_bm25 = read_df(bm_map[t])
+    for t in sorted(results):
+        frames = results[t]
+        df_tfidf = frames['TF-IDF']
+        df_bm25 = frames['BM25']
 
         # Overlap and Spearman (Placeholder for completeness)
-        titles_tfidf = read_titles(tf_map[t])
-        titles_bm25 = read_titles(bm_map[t])
+        titles_tfidf = df_tfidf['title'].astype(str).tolist()
+        titles_bm25 = df_bm25['title'].astype(str).tolist()
         k = 10 
         overlap = calculate_overlap(titles_tfidf, titles_bm25, k)
         overlap_at_k = overlap / k
         spearman = 0.75 
         summaries.append({'topic': t, 'overlap_at_k': overlap_at_k, 'spearman': spearman, 'n_common': overlap, 'plot_path': 'N/A'})
 
-        relevant_urls = set(df_tfidf.loc[df_tfidf['relevan'] == 1, 'url'].dropna().astype(str).tolist()) | set(df_bm25.loc[df_bm25['relevan'] == 1, 'url'].dropna().astype(str).tolist())
+        relevant_urls = set().union(*(df.loc[df['relevan'] == 1, 'url'].dropna().astype(str) for df in frames.values()))
         total_relevant = len(relevant_urls)
 
-        for model_name, df_model in [('TF-IDF', df_tfidf), ('BM25', df_bm25)]:
+        for model_name, df_model in frames.items():
             retrieved_urls = df_model['url'].dropna().astype(str).tolist()
             tp = sum(df_model['relevan'] == 1)
             retrieved = len(df_model)
@@ -110,7 +148,7 @@ def find_and_compare(results_dir='.', out_dir='plots'):
             combined_rows.append({'topic': t, 'model': model_name, 'precision': precision, 'recall': recall, 'f1': f1})
 
             # Confusion Matrix calculation and plotting
-            universe = list(set(df_tfidf['url'].dropna().astype(str).tolist()) | set(df_bm25['url'].dropna().astype(str).tolist()))
+            universe = list(set().union(*(df['url'].dropna().astype(str) for df in frames.values())))
             y_true = [1 if u in relevant_urls else 0 for u in universe]
             y_pred = [1 if u in retrieved_urls else 0 for u in universe]
 
@@ -163,12 +201,20 @@ def find_and_compare(results_dir='.', out_dir='plots'):
 
 
 def main():
-    parser = argparse.ArgumentParser(description='Compare TF-IDF and BM25 result CSV files and plot comparisons')
+    parser = argparse.ArgumentParser(description='Compare TF-IDF, BM25 (and hybrid) result CSV files and plot comparisons')
     parser.add_argument('--results-dir', '-r', default='.', help='Directory containing result CSV files')
     parser.add_argument('--out-dir', '-o', default='plots', help='Output directory for saved plots')
+    parser.add_argument('--live', action='store_true',
+                        help='Re-run the judged queries against the index instead of reading result CSVs')
+    parser.add_argument('--index-dir', default='index', help='Index directory used with --live')
+    parser.add_argument('--corpus', default='corpus_final_stemmed.csv', help='Corpus CSV used with --live')
     args = parser.parse_args()
 
-    res = find_and_compare(results_dir=args.results_dir, out_dir=args.out_dir)
+    if args.live:
+        res = compare_live(results_dir=args.results_dir, out_dir=args.out_dir,
+                           index_dir=args.index_dir, corpus=args.corpus)
+    else:
+        res = find_and_compare(results_dir=args.results_dir, out_dir=args.out_dir)
 
     print('Comparison complete. Summary:')
     
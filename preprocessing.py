@@ -0,0 +1,171 @@
+"""Streaming clean -> stopword -> stem pipeline for scraped corpora.
+
+Replaces the prepo.py / notebook sequence that wrote
+corpus_dokumen_final_clean.csv, _nostop.csv and _stemmed.csv one after the
+other. Documents are read in chunks, run through all three stages in one
+pass and appended to the output CSV, so memory stays flat however large the
+crawl is.
+
+    python preprocessing.py corpus_isi_talenta.csv corpus_isi_talenta_stemmed.csv
+"""
+import os
+import re
+import argparse
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+
+from stemming import get_stemmer
+
+# compiled once instead of re.sub(pattern, ...) per document
+HTML_RE = re.compile(r'<.*?>')
+URL_RE = re.compile(r'http\S+')
+SPACE_RE = re.compile(r'\s+')
+# kata promosi umum, as one alternation instead of six passes
+PROMO_RE = re.compile(r'coba gratis talenta|jadwalkan demo|hubungi sales|hubungi kami|\bklik\b|\bbaca juga\b')
+
+_stopwords = None
+_analyzer = None
+
+
+def clean_text(text):
+    text = HTML_RE.sub('', text)  # hapus HTML tags
+    text = URL_RE.sub('', text)  # hapus URLs
+    text = SPACE_RE.sub(' ', text)  # hapus spasi berlebih
+    text = text.lower()
+    text = PROMO_RE.sub('', text)
+    return text.strip()
+
+
+def get_stopwords():
+    """Sastrawi stopword list as a set (O(1) membership instead of a list scan)."""
+    global _stopwords
+    if _stopwords is None:
+        from Sastrawi.StopWordRemover.StopWordRemoverFactory import StopWordRemoverFactory
+        _stopwords = frozenset(StopWordRemoverFactory().get_stop_words())
+    return _stopwords
+
+
+def remove_stopwords(text, stopwords=None):
+    stopwords = get_stopwords() if stopwords is None else stopwords
+    return ' '.join(w for w in text.split() if w not in stopwords)
+
+
+def stem_text(text):
+    return get_stemmer().stem(text)
+
+
+class Analyzer:
+    """The clean -> stopword -> stem chain that produced ``body_stemmed``, for any text.
+
+    search_index.py uses it for corpora without a body_stemmed column and
+    search.py runs every query through it, so 'penggajian' in a query meets
+    'gaji' in the postings. Analyzed queries are kept in an LRU cache
+    (``query_cache_size`` distinct strings); documents are not cached.
+    """
+
+    def __init__(self, query_cache_size=4096):
+        self.tokens = lru_cache(maxsize=query_cache_size)(self._tokens)
+
+    @staticmethod
+    def analyze(text):
+        """Analyzed text, exactly what preprocess_frame writes to body_stemmed."""
+        return stem_text(remove_stopwords(clean_text(text)))
+
+    def analyze_many(self, texts, stem_cache=None):
+        """Analyze documents, stemming each distinct token once.
+
+        ``stem_cache`` is a stemming.StemCache to reuse (e.g. file-backed);
+        by default a throwaway in-memory one is used.
+        """
+        from stemming import StemCache
+        stem_cache = StemCache(None) if stem_cache is None else stem_cache
+        return stem_cache.stem_documents([remove_stopwords(clean_text(t)) for t in texts])
+
+    def _tokens(self, query):
+        # wrapped per instance as self.tokens: query -> tuple of analyzed tokens for BM25Engine
+        return tuple(self.analyze(str(query)).split())
+
+    def query(self, query):
+        """Analyzed query string for TfidfEngine (cached)."""
+        return ' '.join(self.tokens(query))
+
+    def cache_info(self):
+        return self.tokens.cache_info()
+
+
+def get_analyzer():
+    """Process-wide :class:`Analyzer`, so every caller shares one query cache."""
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = Analyzer()
+    return _analyzer
+
+
+def preprocess_frame(df, text_column='body', stem_many=None):
+    """Add body_clean, body_nostop and body_stemmed columns to one chunk.
+
+    ``stem_many`` stems a list of texts at once (see stemming.StemCache);
+    by default each document goes through the Sastrawi stemmer directly.
+    """
+    text = df[text_column].fillna('').astype(str)
+    df['body_clean'] = text.map(clean_text)
+    df['body_nostop'] = df['body_clean'].map(remove_stopwords)
+    if stem_many is None:
+        df['body_stemmed'] = df['body_nostop'].map(stem_text)
+    else:
+        df['body_stemmed'] = stem_many(df['body_nostop'].tolist())
+    return df
+
+
+def preprocess_csv(input_csv, output_csv, chunksize=500, text_column='body', sumber=None,
+                   keep_intermediate=True, stem_cache=None, workers=None):
+    """Stream ``input_csv`` through the pipeline into ``output_csv``; returns the number of documents.
+
+    ``sumber`` adds a constant source column (e.g. 'talenta'). With
+    ``keep_intermediate=False`` only body_stemmed is written, not body_clean
+    and body_nostop. ``stem_cache`` (a TSV path) reuses token stems across
+    runs and ``workers`` stems new tokens in that many processes; either one
+    switches stemming to stemming.StemCache.
+    """
+    import pandas as pd
+    from stemming import StemCache, stem_pool
+
+    cache = StemCache(stem_cache) if (stem_cache or workers) else None
+    tmp_path = output_csv + '.tmp'
+    total = 0
+    with (stem_pool(workers) if workers else nullcontext()) as pool, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+        stem_many = (lambda texts: cache.stem_documents(texts, pool)) if cache is not None else None
+        for i, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunksize)):
+            chunk = preprocess_frame(chunk, text_column, stem_many)
+            if sumber is not None:
+                chunk['sumber'] = sumber
+            if not keep_intermediate:
+                chunk = chunk.drop(columns=['body_clean', 'body_nostop'])
+            chunk.to_csv(out, header=(i == 0), index=False)
+            total += len(chunk)
+    os.replace(tmp_path, output_csv)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean, remove stopwords and stem a scraped corpus CSV in one pass')
+    parser.add_argument('input', help='Scraped CSV (url,title,body,date)')
+    parser.add_argument('output', help='Output CSV with body_clean, body_nostop and body_stemmed')
+    parser.add_argument('--chunksize', type=int, default=500, help='Documents per chunk')
+    parser.add_argument('--sumber', help="Value for a 'sumber' column, e.g. talenta or kompasiana")
+    parser.add_argument('--stemmed-only', action='store_true', help='Do not write body_clean/body_nostop')
+    parser.add_argument('--stem-cache', help='Persistent token->stem cache file, e.g. stem_cache.tsv')
+    parser.add_argument('--workers', type=int, help='Stem new tokens in this many processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n = preprocess_csv(args.input, args.output, args.chunksize, sumber=args.sumber,
+                       keep_intermediate=not args.stemmed_only,
+                       stem_cache=args.stem_cache, workers=args.workers)
+    print(f"{n} dokumen diproses ke {args.output} dalam {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""In-process LRU cache for search results.
+
+One instance is meant to be shared by every Streamlit session in a worker
+process (app.py keeps it in ``st.cache_resource``), but nothing here depends
+on Streamlit. Entries are keyed on ``(normalized query, model, k)`` and the
+whole cache is dropped as soon as it is used with a different index version.
+"""
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace; both rankers ignore case and spacing."""
+    return ' '.join(str(query).lower().split())
+
+
+class QueryCache:
+    """Thread-safe bounded LRU mapping ``(query, model, k)`` to a result.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # caller holds the lock
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, query, model, k, version=None, default=None):
+        key = (normalize_query(query), model, k)
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, query, model, k, value, version=None):
+        key = (normalize_query(query), model, k)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, query, model, k, compute, version=None):
+        """Return the cached result or call ``compute()`` and cache it.
+
+        ``compute`` runs outside the lock, so two sessions missing on the same
+        key at once may both compute it; the later result wins.
+        """
+        missing = object()
+        value = self.get(query, model, k, version, missing)
+        if value is missing:
+            value = compute()
+            self.put(query, model, k, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'version': self.version,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,472 @@
+"""Ranking primitives: inverted-index BM25 and TF-IDF engines and top-k selection.
+
+Scores are bit-identical to ``rank_bm25.BM25Okapi`` / ``X * q_vec.T`` for the
+same parameters, but a query only touches the postings of its own terms
+instead of looping over every document. Both engines default to MaxScore
+pruning driven by per-term upper bounds stored in the index; pass
+``exhaustive=True`` to score every posting instead. :class:`HybridEngine`
+fuses the two rankings.
+"""
+import math
+import numpy as np
+from scipy import sparse
+from tracing import span
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+# hybrid fusion: weight of the TF-IDF side for score interpolation, constant of reciprocal rank fusion
+HYBRID_ALPHA = 0.5
+RRF_K = 60
+HYBRID_METHODS = ('interpolate', 'rrf')
+
+_EMPTY_IDS = np.zeros(0, dtype=np.int64)
+_EMPTY_SCORES = np.zeros(0)
+
+
+def top_k(scores, k, ids=None):
+    """Return ``(ids, scores)`` of the k highest scores, best first.
+
+    Uses ``np.partition`` instead of a full sort. Ties are ordered by
+    ascending id, which is what the old ``sorted(..., reverse=True)`` did.
+    """
+    scores = np.asarray(scores)
+    ids = np.arange(len(scores)) if ids is None else np.asarray(ids)
+    if k <= 0 or len(scores) == 0:
+        return _EMPTY_IDS, _EMPTY_SCORES
+    if len(scores) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        scores, ids = scores[keep], ids[keep]
+    order = np.lexsort((ids, -scores))[:k]
+    return ids[order], scores[order]
+
+
+def _kth_largest(scores, k):
+    return np.partition(scores, len(scores) - k)[len(scores) - k]
+
+
+def _probe(docs, cand):
+    """Positions of ``cand`` in the sorted postings ``docs`` and a mask of which are present."""
+    pos = np.searchsorted(docs, cand)
+    hit = pos < len(docs)
+    hit[hit] = docs[pos[hit]] == cand[hit]
+    return pos, hit
+
+
+def maxscore_top_k(lists, k, min_score=None):
+    """Exact top-k with MaxScore dynamic pruning.
+
+    ``lists`` has one ``(docs, contrib, upper)`` entry per query term, in query
+    order: the term's ascending doc ids, a function mapping postings positions
+    to score contributions, and an upper bound on any single contribution
+    (contributions must be non-negative).
+
+    Terms are visited from the largest upper bound down. Once the summed bounds
+    of the remaining terms fall below the current k-th best partial score, no
+    new document can enter the top k, so the remaining ("non-essential") lists
+    are only probed for the surviving candidates by binary search. The
+    survivors are finally rescored term by term in query order, which makes
+    the result bit-identical to exhaustive scoring.
+    """
+    if k <= 0 or not lists:
+        return _EMPTY_IDS, _EMPTY_SCORES
+    upper = np.array([u for _, _, u in lists], dtype=float)
+    order = np.argsort(-upper, kind='stable')
+    # remaining[i]: best possible gain from terms order[i:]
+    remaining = np.cumsum(upper[order][::-1])[::-1]
+    theta = -np.inf if min_score is None else min_score
+
+    def tol():
+        # partial sums are accumulated in a different order than the final scores
+        return 1e-9 * max(1.0, abs(theta))
+
+    cand, partial = _EMPTY_IDS, _EMPTY_SCORES
+    i = 0
+    while i < len(order):
+        if len(cand) >= k:
+            theta = max(theta, _kth_largest(partial, k))
+        if remaining[i] < theta - tol():
+            break
+        docs, contrib, _ = lists[order[i]]
+        if i == 0:
+            cand, partial = np.asarray(docs), contrib(slice(None))
+        else:
+            merged = np.union1d(cand, docs)
+            acc = np.zeros(len(merged))
+            acc[np.searchsorted(merged, cand)] = partial
+            acc[np.searchsorted(merged, docs)] += contrib(slice(None))
+            cand, partial = merged, acc
+        i += 1
+
+    for j in range(i, len(order)):
+        if len(cand) >= k:
+            theta = max(theta, _kth_largest(partial, k))
+        keep = partial + remaining[j] >= theta - tol()
+        cand, partial = cand[keep], partial[keep]
+        docs, contrib, _ = lists[order[j]]
+        pos, hit = _probe(docs, cand)
+        partial[hit] += contrib(pos[hit])
+
+    if len(cand) >= k:
+        theta = max(theta, _kth_largest(partial, k))
+    keep = partial >= theta - tol()
+    cand = cand[keep]
+
+    exact = np.zeros(len(cand))
+    for docs, contrib, _ in lists:
+        pos, hit = _probe(docs, cand)
+        exact[hit] += contrib(pos[hit])
+    if min_score is not None:
+        keep = exact >= min_score
+        cand, exact = cand[keep], exact[keep]
+    return top_k(exact, k, cand)
+
+
+def tfidf_scores(X, q_vec):
+    """Sparse ``X @ q`` restricted to the query's non-zero columns.
+
+    Returns ``(doc_ids, scores)`` for documents sharing at least one term with
+    the query. ``X`` should be CSC (as stored by search_index) so the column
+    gather only reads the postings of the query terms.
+    """
+    q_vec = sparse.csr_matrix(q_vec)
+    cols = q_vec.indices
+    if len(cols) == 0:
+        return _EMPTY_IDS, _EMPTY_SCORES
+    weights = sparse.csc_matrix(q_vec.data.reshape(-1, 1))
+    res = sparse.csc_matrix(X[:, cols] @ weights)
+    res.eliminate_zeros()
+    return res.indices.astype(np.int64), res.data
+
+
+def top_k_columns(S, k, min_score=None):
+    """Per-column :func:`top_k` of a sparse (n_docs, n_queries) score matrix."""
+    S = sparse.csc_matrix(S)
+    S.eliminate_zeros()
+    hits = []
+    for j in range(S.shape[1]):
+        start, end = S.indptr[j], S.indptr[j + 1]
+        ids, scores = S.indices[start:end].astype(np.int64), S.data[start:end]
+        if min_score is not None:
+            keep = scores >= min_score
+            ids, scores = ids[keep], scores[keep]
+        hits.append(top_k(scores, k, ids))
+    return hits
+
+
+def bm25_idf(doc_freq, n_docs, order, epsilon=BM25_EPSILON):
+    """IDF exactly as rank_bm25.BM25Okapi computes it (negative IDF floored to epsilon * mean).
+
+    ``order`` lists term ids in corpus first-occurrence order; rank_bm25 sums
+    the IDFs in that order, so we do the same to get bit-identical scores.
+    """
+    idf = np.zeros(len(doc_freq))
+    idf_sum = 0
+    for t in order:
+        freq = int(doc_freq[t])
+        idf[t] = math.log(n_docs - freq + 0.5) - math.log(freq + 0.5)
+        idf_sum += idf[t]
+    if len(idf):
+        idf[idf < 0] = epsilon * (idf_sum / len(idf))
+    return idf
+
+
+def tfidf_idf(doc_freq, n_docs):
+    """Smoothed IDF exactly as sklearn's TfidfTransformer computes it: ``ln((1 + n) / (1 + df)) + 1``."""
+    df = np.asarray(doc_freq, dtype=np.float64) + 1.0
+    idf = np.full_like(df, fill_value=n_docs + 1, dtype=np.float64)
+    idf /= df
+    np.log(idf, out=idf)
+    idf += 1.0
+    return idf
+
+
+def tfidf_matrix(tf, idf):
+    """L2-normalised TF-IDF rows from raw term counts, same arithmetic as TfidfVectorizer.
+
+    ``tf`` is a sparse doc x term count matrix; returns a sorted CSC matrix.
+    Row norms are summed in the order the entries of a CSR ``tf`` are stored
+    in, so CountVectorizer output gives bit-identical weights.
+    """
+    from sklearn.preprocessing import normalize
+    X = sparse.csr_matrix(tf, dtype=np.float64, copy=True)
+    X.data *= idf[X.indices]
+    X = normalize(X, norm='l2', copy=False).tocsc()
+    X.sort_indices()
+    return X
+
+
+class BM25Engine:
+    """Okapi BM25 over term -> postings arrays (CSC layout).
+
+    ``indptr[t]:indptr[t + 1]`` slices ``doc_ids``/``tfs`` for term id ``t``;
+    doc ids inside a postings list are ascending.
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, tfs, idf, doc_len,
+                 k1=BM25_K1, b=BM25_B, avgdl=None, max_contrib=None):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.idf = idf
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(np.sum(doc_len)) / len(doc_len) if avgdl is None else avgdl
+        self.corpus_size = len(doc_len)
+        # same expression rank_bm25 evaluates per query, hoisted out of the query path
+        self.norm = k1 * (1 - b + b * np.asarray(doc_len) / self.avgdl)
+        self.max_contrib = self.term_upper_bounds() if max_contrib is None else max_contrib
+        self._weights = None
+
+    @classmethod
+    def from_corpus(cls, docs, k1=BM25_K1, b=BM25_B, epsilon=BM25_EPSILON):
+        """Build in memory from whitespace-tokenized strings (``doc.split()``, like BM25Okapi)."""
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        counts = CountVectorizer(analyzer=str.split).fit(docs)
+        tf = counts.transform(docs)
+        doc_len = np.asarray(tf.sum(axis=1)).ravel().astype(np.int32)
+        postings = tf.tocsc()
+        postings.sort_indices()
+        first_seen = dict.fromkeys(w for doc in docs for w in doc.split())
+        order = [counts.vocabulary_[w] for w in first_seen]
+        idf = bm25_idf(np.diff(postings.indptr), len(doc_len), order, epsilon)
+        vocab = {t: i for i, t in enumerate(counts.get_feature_names_out().tolist())}
+        return cls(vocab, postings.indptr.astype(np.int64), postings.indices.astype(np.int32),
+                   postings.data.astype(np.int32), idf, doc_len, k1, b)
+
+    @property
+    def terms(self):
+        """Vocabulary as a list ordered by term id."""
+        terms = [None] * len(self.vocab)
+        for t, i in self.vocab.items():
+            terms[i] = t
+        return terms
+
+    def postings(self, t):
+        start, end = self.indptr[t], self.indptr[t + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def term_contribution(self, t, docs, tfs):
+        return self.idf[t] * (tfs * (self.k1 + 1) / (tfs + self.norm[docs]))
+
+    def _posting_contributions(self):
+        lengths = np.diff(self.indptr)
+        term_of = np.repeat(np.arange(len(lengths)), lengths)
+        return term_of, self.idf[term_of] * (self.tfs * (self.k1 + 1) / (self.tfs + self.norm[self.doc_ids]))
+
+    def term_upper_bounds(self):
+        """Largest single-document contribution of every term (the MaxScore bound)."""
+        term_of, contrib = self._posting_contributions()
+        bounds = np.zeros(len(self.indptr) - 1)
+        np.maximum.at(bounds, term_of, contrib)
+        return bounds
+
+    def weights(self):
+        """Sparse doc x term matrix of BM25 contributions, built on first use."""
+        if self._weights is None:
+            _, contrib = self._posting_contributions()
+            self._weights = sparse.csc_matrix((contrib, self.doc_ids, self.indptr),
+                                              shape=(self.corpus_size, len(self.indptr) - 1))
+        return self._weights
+
+    def batch_scores(self, queries):
+        """Score many tokenized queries with one sparse product; returns an (n_docs, n_queries) matrix.
+
+        Equal to :meth:`score` per query up to floating-point summation order.
+        """
+        term_ids, query_ids = [], []
+        for i, query in enumerate(queries):
+            for q in query:
+                if q in self.vocab:
+                    term_ids.append(self.vocab[q])
+                    query_ids.append(i)
+        # repeated query terms are summed, i.e. counted twice like in get_scores
+        Q = sparse.csc_matrix((np.ones(len(term_ids)), (term_ids, query_ids)),
+                              shape=(len(self.indptr) - 1, len(queries)))
+        return self.weights() @ Q
+
+    def score(self, query):
+        """Sparse scores: ``(doc_ids, scores)`` for documents containing at least one query term."""
+        terms = [self.vocab[q] for q in query if q in self.vocab]
+        if not terms:
+            return _EMPTY_IDS, _EMPTY_SCORES
+        lists = [self.postings(t) for t in terms]
+        candidates = np.unique(np.concatenate([docs for docs, _ in lists]))
+        acc = np.zeros(len(candidates))
+        # one pass per query term (duplicates count twice, as in rank_bm25)
+        for t, (docs, tfs) in zip(terms, lists):
+            acc[np.searchsorted(candidates, docs)] += self.term_contribution(t, docs, tfs)
+        return candidates, acc
+
+    def get_scores(self, query):
+        """Dense score vector, drop-in for ``BM25Okapi.get_scores``."""
+        scores = np.zeros(self.corpus_size)
+        docs, acc = self.score(query)
+        scores[docs] = acc
+        return scores
+
+    def top_k(self, query, k=10, exhaustive=False):
+        """``(doc_ids, scores)`` of the k best matching documents; non-matching documents are never returned.
+
+        Uses MaxScore pruning unless ``exhaustive`` is set; both give identical results.
+        """
+        terms = [self.vocab[q] for q in query if q in self.vocab]
+        if exhaustive or np.any(self.max_contrib[terms] < 0):
+            with span('score'):
+                docs, acc = self.score(query)
+            with span('top_k'):
+                return top_k(acc, k, docs)
+        with span('score'):
+            return maxscore_top_k([self._scored_list(t) for t in terms], k)
+
+    def _scored_list(self, t):
+        docs, tfs = self.postings(t)
+        return docs, lambda sel: self.term_contribution(t, docs[sel], tfs[sel]), self.max_contrib[t]
+
+
+class TfidfEngine:
+    """Cosine-similarity ranking over the column-major TF-IDF matrix ``X``.
+
+    ``col_max[t]`` is the largest weight in column ``t``; times the query
+    weight it bounds a term's contribution for MaxScore pruning.
+    """
+
+    def __init__(self, vectorizer, X, col_max=None):
+        self.vectorizer = vectorizer
+        self.X = sparse.csc_matrix(X)
+        self.X.sort_indices()
+        if col_max is None:
+            col_max = self.X.max(axis=0).toarray().ravel()
+        self.col_max = col_max
+
+    def query_vector(self, query):
+        q_vec = self.vectorizer.transform([query])
+        q_vec.sort_indices()
+        return q_vec
+
+    def score(self, query):
+        """Sparse scores: ``(doc_ids, scores)`` for documents sharing a term with the query."""
+        return tfidf_scores(self.X, self.query_vector(query))
+
+    def batch_scores(self, queries):
+        """Score many query strings with one sparse-sparse product; returns an (n_docs, n_queries) matrix."""
+        Q = self.vectorizer.transform(queries)
+        return self.X @ Q.T
+
+    def top_k(self, query, k=10, min_score=None, exhaustive=False):
+        """``(doc_ids, scores)`` of the k most similar documents scoring above zero (and ``min_score``)."""
+        with span('vectorize'):
+            q_vec = self.query_vector(query)
+        if exhaustive:
+            with span('score'):
+                docs, scores = tfidf_scores(self.X, q_vec)
+            with span('top_k'):
+                if min_score is not None:
+                    keep = scores >= min_score
+                    docs, scores = docs[keep], scores[keep]
+                return top_k(scores, k, docs)
+        with span('score'):
+            return maxscore_top_k([self._scored_list(t, w) for t, w in zip(q_vec.indices, q_vec.data)],
+                                  k, min_score)
+
+    def _scored_list(self, t, weight):
+        start, end = self.X.indptr[t], self.X.indptr[t + 1]
+        docs, values = self.X.indices[start:end], self.X.data[start:end]
+        return docs, lambda sel: values[sel] * weight, self.col_max[t] * weight
+
+
+def max_normalized(scores):
+    """``scores`` divided by their maximum (all zeros stay zeros); scores are non-negative."""
+    top = scores.max() if len(scores) else 0.0
+    return scores / top if top > 0 else np.zeros(len(scores))
+
+
+def reciprocal_ranks(scores, k=RRF_K):
+    """``1 / (k + rank)`` of every positive score (rank 1 is the best, ties by position); 0 elsewhere."""
+    order = np.lexsort((np.arange(len(scores)), -scores))
+    ranks = np.empty(len(scores))
+    ranks[order] = np.arange(1, len(scores) + 1)
+    return np.where(scores > 0, 1.0 / (k + ranks), 0.0)
+
+
+class HybridEngine:
+    """TF-IDF and BM25 fused into one ranking.
+
+    Both sides are accumulated over one candidate set, the union of the
+    postings of the query terms in the two engines, and fused with either
+    ``interpolate`` (``alpha * tfidf / max + (1 - alpha) * bm25 / max``) or
+    ``rrf`` (reciprocal rank fusion, ``sum 1 / (rrf_k + rank)``). There is
+    no MaxScore pruning: the normalisation needs every candidate's score.
+    """
+
+    def __init__(self, tfidf, bm25, method='interpolate', alpha=HYBRID_ALPHA, rrf_k=RRF_K):
+        if method not in HYBRID_METHODS:
+            raise ValueError(f"unknown fusion method {method!r}, expected one of {HYBRID_METHODS}")
+        self.tfidf = tfidf
+        self.bm25 = bm25
+        self.method = method
+        self.alpha = alpha
+        self.rrf_k = rrf_k
+
+    def component_scores(self, query):
+        """``(doc_ids, tfidf_scores, bm25_scores)`` of the documents matching a query term in either engine.
+
+        ``query`` is the list of analyzed tokens (what BM25Engine takes).
+        """
+        with span('vectorize'):
+            q_vec = self.tfidf.query_vector(' '.join(query))
+        with span('score'):
+            lists = (
+                [self.tfidf._scored_list(t, w) for t, w in zip(q_vec.indices, q_vec.data)],
+                [self.bm25._scored_list(self.bm25.vocab[q]) for q in query if q in self.bm25.vocab],
+            )
+            if not lists[0] and not lists[1]:
+                return _EMPTY_IDS, _EMPTY_SCORES, _EMPTY_SCORES
+            docs = np.unique(np.concatenate([d for side in lists for d, _, _ in side]))
+            sides = []
+            for side in lists:
+                acc = np.zeros(len(docs))
+                for d, contrib, _ in side:
+                    acc[np.searchsorted(docs, d)] += contrib(slice(None))
+                sides.append(acc)
+        return docs, sides[0], sides[1]
+
+    def fuse(self, tfidf_scores, bm25_scores):
+        """Fused scores of candidates given their TF-IDF and BM25 scores (0 where a side does not match)."""
+        if self.method == 'rrf':
+            return reciprocal_ranks(tfidf_scores, self.rrf_k) + reciprocal_ranks(bm25_scores, self.rrf_k)
+        return self.alpha * max_normalized(tfidf_scores) + (1 - self.alpha) * max_normalized(bm25_scores)
+
+    def score(self, query):
+        """Sparse fused scores: ``(doc_ids, scores)``."""
+        docs, a, b = self.component_scores(query)
+        return docs, self.fuse(a, b)
+
+    def batch_scores(self, queries):
+        """Fused scores of many tokenized queries as an (n_docs, n_queries) CSC matrix.
+
+        Both sides come from one sparse product each (see the engines' batch_scores).
+        """
+        T = sparse.csc_matrix(self.tfidf.batch_scores([' '.join(q) for q in queries]))
+        B = sparse.csc_matrix(self.bm25.batch_scores(queries))
+        cols = []
+        for j in range(len(queries)):
+            t, b = T[:, j], B[:, j]
+            docs = np.union1d(t.indices, b.indices)
+            a = np.zeros(len(docs))
+            a[np.searchsorted(docs, t.indices)] = t.data
+            c = np.zeros(len(docs))
+            c[np.searchsorted(docs, b.indices)] = b.data
+            cols.append(sparse.csc_matrix((self.fuse(a, c), (docs, np.zeros(len(docs), dtype=np.int64))),
+                                          shape=(T.shape[0], 1)))
+        return sparse.hstack(cols, format='csc') if cols else sparse.csc_matrix((T.shape[0], 0))
+
+    def top_k(self, query, k=10):
+        """``(doc_ids, fused scores)`` of the k best documents matching at least one query term."""
+        docs, a, b = self.component_scores(query)
+        with span('top_k'):
+            return top_k(self.fuse(a, b), k, docs)
@@ -0,0 +1,191 @@
+"""Search functions shared by app.py and offline scripts.
+
+Kept out of app.py so they can be imported without starting Streamlit.
+"""
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ranking import HybridEngine, top_k_columns
+from preprocessing import get_analyzer
+from tracing import span
+
+MODELS = ('tfidf', 'bm25', 'hybrid')
+RESULT_COLUMNS = ['title', 'body_stemmed', 'sumber', 'url']
+# what the results page shows; `snippet` only exists in a corpus_store.CorpusStore
+DISPLAY_COLUMNS = ['title', 'snippet', 'sumber', 'url']
+# hits ranked once per query for paging through (app.py), and hits per page
+DEEP_K = 1000
+PAGE_SIZE = 10
+
+
+def fetch_rows(df, ids, columns=RESULT_COLUMNS):
+    """Rows ``ids`` (positional) of a DataFrame or :class:`corpus_store.CorpusStore`."""
+    with span('fetch'):
+        if hasattr(df, 'frame'):
+            return df.frame(ids, columns)
+        return df.iloc[ids][columns]
+
+
+def with_snippets(rows, ids, tokens, snippets):
+    """Replace the ``snippet`` column with query-highlighted ones from a snippets.Snippeter (if given)."""
+    if snippets is None or 'snippet' not in rows.columns:
+        return rows
+    with span('snippet'):
+        return rows.assign(snippet=snippets.snippets(ids, tokens))
+
+
+def simple_search(query, tfidf, df, n=10, min_score=None, exhaustive=False, columns=RESULT_COLUMNS,
+                  analyzer=None, snippets=None):
+    """Top-n TF-IDF hits (cosine similarity, both sides are L2-normalised).
+
+    ``tfidf`` is a :class:`ranking.TfidfEngine` (see ``SearchIndex.tfidf``).
+    The query goes through the same clean/stopword/stem chain as the corpus
+    (``analyzer``, default preprocessing.get_analyzer()). Only documents
+    sharing a term with the query are returned; ``min_score`` additionally
+    drops hits scoring below it. ``exhaustive`` disables MaxScore pruning
+    (for verification; results are identical). With ``snippets``
+    (``SearchIndex.snippeter()``) the ``snippet`` column is highlighted HTML
+    around the query terms.
+    """
+    analyzer = analyzer or get_analyzer()
+    with span('analyze'):
+        tokens = analyzer.tokens(query)
+        query = ' '.join(tokens)
+    top_idx, _ = tfidf.top_k(query, n, min_score=min_score, exhaustive=exhaustive)
+    return with_snippets(fetch_rows(df, top_idx, columns), top_idx, tokens, snippets)
+
+
+def bm25_search(query, bm25, df, n=10, exhaustive=False, columns=RESULT_COLUMNS, analyzer=None,
+                snippets=None):
+    """Top-n BM25 hits; ``bm25`` is a :class:`ranking.BM25Engine` (see ``SearchIndex.bm25``).
+
+    The query is tokenized by ``analyzer`` and snippets are made like in simple_search.
+    """
+    analyzer = analyzer or get_analyzer()
+    with span('analyze'):
+        tokens = list(analyzer.tokens(query))
+    top_idx, _ = bm25.top_k(tokens, n, exhaustive=exhaustive)
+    return with_snippets(fetch_rows(df, top_idx, columns), top_idx, tokens, snippets)
+
+
+def hybrid_search(query, tfidf, bm25, df, n=10, method='interpolate', columns=RESULT_COLUMNS, analyzer=None,
+                  snippets=None):
+    """Top-n hits of TF-IDF and BM25 fused (ranking.HybridEngine, ``method`` 'interpolate' or 'rrf').
+
+    Both models are scored in one pass over the query terms' postings; rows
+    and snippets are fetched once, like in bm25_search.
+    """
+    analyzer = analyzer or get_analyzer()
+    with span('analyze'):
+        tokens = list(analyzer.tokens(query))
+    top_idx, _ = HybridEngine(tfidf, bm25, method).top_k(tokens, n)
+    return with_snippets(fetch_rows(df, top_idx, columns), top_idx, tokens, snippets)
+
+
+def semantic_search(query, dense, df, n=10, nprobe=None, columns=RESULT_COLUMNS, analyzer=None, snippets=None):
+    """Top-n hits of the optional LSA + IVF index (``SearchIndex.dense()``, see dense.py).
+
+    Hits need not contain any query term; ``nprobe`` overrides the number of
+    IVF lists scored (more lists, higher recall, slower).
+    """
+    analyzer = analyzer or get_analyzer()
+    with span('analyze'):
+        tokens = list(analyzer.tokens(query))
+    top_idx, _ = dense.top_k(tokens, n, nprobe)
+    return with_snippets(fetch_rows(df, top_idx, columns), top_idx, tokens, snippets)
+
+
+class RankedList:
+    """Doc ids and scores of one query's top hits, best first, as compact arrays (8 bytes per hit).
+
+    Pages are slices of it, so paging through the results never scores again.
+    """
+
+    def __init__(self, ids, scores, tokens):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.tokens = tuple(tokens)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def page(self, cursor=0, size=PAGE_SIZE):
+        """``(ids, scores, next_cursor)`` of the hits from position ``cursor``; ``next_cursor`` is None on the last page."""
+        cursor = max(0, cursor)
+        end = cursor + size
+        return self.ids[cursor:end], self.scores[cursor:end], (end if end < len(self.ids) else None)
+
+
+def rank(query, model, tfidf, bm25, k=DEEP_K, analyzer=None, dense=None):
+    """:class:`RankedList` of the top-k hits of ``model`` (one of MODELS), to be shown with page_rows.
+
+    ``model='semantic'`` ranks with ``dense`` (dense.DenseIndex) instead.
+    """
+    analyzer = analyzer or get_analyzer()
+    with span('analyze'):
+        tokens = list(analyzer.tokens(query))
+    if model == 'tfidf':
+        ids, scores = tfidf.top_k(' '.join(tokens), k)
+    elif model == 'bm25':
+        ids, scores = bm25.top_k(tokens, k)
+    elif model == 'hybrid':
+        ids, scores = HybridEngine(tfidf, bm25).top_k(tokens, k)
+    elif model == 'semantic':
+        if dense is None:
+            raise ValueError("model 'semantic' needs the dense index, none is loaded (python dense.py build)")
+        ids, scores = dense.top_k(tokens, k)
+    else:
+        raise ValueError(f"unknown model {model!r}, expected one of {MODELS} or 'semantic'")
+    return RankedList(ids, scores, tokens)
+
+
+def page_rows(df, ranking, cursor=0, size=PAGE_SIZE, columns=RESULT_COLUMNS, snippets=None):
+    """``(rows, next_cursor)``: the hits of one page of ``ranking``, fetched (and snippeted) like simple_search does."""
+    ids, _, next_cursor = ranking.page(cursor, size)
+    return with_snippets(fetch_rows(df, ids, columns), ids, ranking.tokens, snippets), next_cursor
+
+
+def batch_search(queries, tfidf, bm25, df, n=10, columns=RESULT_COLUMNS, analyzer=None):
+    """Run a list of queries through all models with one sparse product per model.
+
+    Returns ``{query: {'TF-IDF': frame, 'BM25': frame, 'Hybrid': frame}}``;
+    the frames match what simple_search / bm25_search / hybrid_search return
+    for each query.
+    """
+    analyzer = analyzer or get_analyzer()
+    tokens = [list(analyzer.tokens(q)) for q in queries]
+    tfidf_hits = top_k_columns(tfidf.batch_scores([analyzer.query(q) for q in queries]), n)
+    bm25_hits = top_k_columns(bm25.batch_scores(tokens), n)
+    hybrid_hits = top_k_columns(HybridEngine(tfidf, bm25).batch_scores(tokens), n)
+    if hasattr(df, 'frame'):
+        rows = lambda ids: df.frame(ids, columns)
+    else:
+        # project the columns once; slicing the narrow frame per query is much cheaper
+        shown = df[columns]
+        rows = lambda ids: shown.iloc[ids]
+    return {
+        q: {'TF-IDF': rows(t_idx), 'BM25': rows(b_idx), 'Hybrid': rows(h_idx)}
+        for q, (t_idx, _), (b_idx, _), (h_idx, _) in zip(queries, tfidf_hits, bm25_hits, hybrid_hits)
+    }
+
+
+# Scoring is NumPy/SciPy work that releases the GIL, so both rankers can run side by side
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='search')
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def search_concurrently(tasks):
+    """Run ``{name: callable}`` on the shared thread pool.
+
+    Yields ``(name, result, elapsed_ms)`` in completion order, so a caller can
+    show each result as soon as it is ready. Exceptions are re-raised.
+    """
+    futures = {_executor.submit(_timed, fn): name for name, fn in tasks.items()}
+    for future in as_completed(futures):
+        result, elapsed_ms = future.result()
+        yield futures[future], result, elapsed_ms
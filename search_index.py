@@ -0,0 +1,710 @@
+"""Offline, segmented search index for WorkWise.
+
+Run ``python search_index.py build`` once after the corpus changes. The
+TF-IDF and BM25 postings, vocabularies, document lengths and a columnar
+copy of the documents (corpus_store.py) are written as an immutable
+*segment* of plain ``.npy`` arrays, so a fresh Streamlit worker only has to
+memory-map them instead of refitting both models.
+
+New crawl output does not need a rebuild: ``python search_index.py add
+delta.csv`` writes it as another segment, and documents whose url already
+exists are tombstoned (an update is delete + add). ``delete`` only
+tombstones; ``merge`` compacts all segments into one. Every change
+publishes a new *generation*: a manifest listing the segments, their
+tombstones and the live document count / total length (kept up to date on
+every change, so N and avgdl never need a corpus scan). ``index/CURRENT``
+names the current generation and is swapped atomically; readers of an older
+generation are unaffected and app.py picks the new one up on its next rerun.
+
+    index/CURRENT                    -> v4-<corpus sha12>.000003
+    index/manifests/<version>.json
+    index/segments/<name>/           postings, vocab, store/, deleted-<version>.npy
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import argparse
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from ranking import (BM25Engine, TfidfEngine, BM25_K1, BM25_B, BM25_EPSILON,
+                     bm25_idf, tfidf_idf, tfidf_matrix)
+from snippets import Positions
+
+FORMAT_VERSION = 4
+DEFAULT_CORPUS = "corpus_final_stemmed.csv"
+DEFAULT_INDEX_DIR = "index"
+TEXT_COLUMN = "body_stemmed"
+# merge_in_background compacts once a generation has more segments than this
+MAX_SEGMENTS = 8
+# generations whose files survive garbage collection (older readers may still use them)
+KEEP_GENERATIONS = 2
+
+
+class StaleIndexError(RuntimeError):
+    """Raised when the index on disk was built from a different corpus."""
+
+
+def corpus_checksum(path, chunk_size=1 << 20):
+    """SHA-256 of the raw corpus file."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -- segments -----------------------------------------------------------------
+
+def analyzed_text(df):
+    """The text to index: ``body_stemmed``, or ``body`` run through preprocessing.Analyzer."""
+    import pandas as pd
+    if TEXT_COLUMN in df.columns:
+        return df[TEXT_COLUMN].fillna("").astype(str)
+    # raw scrape (url,title,body,date): same analyzer the query side uses
+    from preprocessing import get_analyzer
+    return pd.Series(get_analyzer().analyze_many(df["body"].fillna("").astype(str)), index=df.index)
+
+
+def _count(docs, vectorizer):
+    """``(terms, CSR counts)`` of ``docs`` as the vectorizer returns them (rows not sorted).
+
+    An all-empty batch gives an empty vocabulary.
+    """
+    try:
+        tf = vectorizer.fit_transform(docs)
+    except ValueError:
+        return [], sparse.csr_matrix((len(docs), 0), dtype=np.int64)
+    return vectorizer.get_feature_names_out().tolist(), tf
+
+
+class Segment:
+    """One immutable segment: per-term postings for TF-IDF (sklearn tokens) and BM25 (whitespace tokens).
+
+    Besides the raw counts, a segment stores the TF-IDF weights, IDFs and
+    MaxScore bounds it would have on its own; :class:`SearchIndex` uses
+    them directly while it is the only segment and has no tombstones.
+    """
+
+    ARRAYS = ("tf_indptr", "tf_docs", "tf_counts", "bm25_indptr", "bm25_docs", "bm25_tfs",
+              "bm25_order", "doc_len")
+    STANDALONE = ("tfidf_data", "tfidf_idf", "tfidf_max", "bm25_idf", "bm25_max")
+
+    def __init__(self, path, arrays=None, terms=None, meta=None):
+        self.path = path
+        if arrays is None:
+            def load(name):
+                return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+                meta = json.load(fh)
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise StaleIndexError(f"segment format {meta.get('format_version')} != {FORMAT_VERSION}")
+            arrays = {name: load(name) for name in self.ARRAYS + self.STANDALONE}
+            terms = {}
+            for kind in ("tfidf", "bm25"):
+                with open(os.path.join(path, f"{kind}_vocab.json"), encoding="utf-8") as fh:
+                    terms[kind] = json.load(fh)
+        self.meta = meta
+        self.arrays = arrays
+        self.terms = terms
+        self.n_docs = meta["n_docs"]
+
+    def postings(self, kind):
+        """``(indptr, doc_ids, counts)``; ``kind`` is ``"tfidf"`` or ``"bm25"``."""
+        a = self.arrays
+        if kind == "tfidf":
+            return a["tf_indptr"], a["tf_docs"], a["tf_counts"]
+        return a["bm25_indptr"], a["bm25_docs"], a["bm25_tfs"]
+
+    def first_seen(self):
+        """BM25 terms in corpus first-occurrence order (rank_bm25 sums IDFs in this order)."""
+        return [self.terms["bm25"][i] for i in self.arrays["bm25_order"]]
+
+    def deleted(self, filename):
+        if not filename:
+            return np.zeros(0, dtype=np.int64)
+        return np.load(os.path.join(self.path, filename))
+
+    def store(self):
+        from corpus_store import CorpusStore
+        return CorpusStore(os.path.join(self.path, "store"))
+
+
+def _merge_postings(segments, offsets, live, kind):
+    """Postings of all segments under one sorted vocabulary, tombstoned documents left out.
+
+    Returns ``(terms, csc counts)`` over global doc ids; terms without a live
+    document are dropped.
+    """
+    terms = sorted(set().union(*(s.terms[kind] for s in segments)))
+    ids = {t: i for i, t in enumerate(terms)}
+    rows, cols, vals = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    for seg, off in zip(segments, offsets):
+        indptr, docs, counts = seg.postings(kind)
+        local = np.array([ids[t] for t in seg.terms[kind]], dtype=np.int64)
+        term_of = np.repeat(local, np.diff(indptr))
+        gdocs = np.asarray(docs, dtype=np.int64) + off
+        keep = live[gdocs]
+        rows.append(gdocs[keep])
+        cols.append(term_of[keep])
+        vals.append(np.asarray(counts, dtype=np.int64)[keep])
+    m = sparse.csc_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(len(live), len(terms)))
+    used = np.diff(m.indptr) > 0
+    if not used.all():
+        m = m[:, np.flatnonzero(used)]
+        terms = [t for t, u in zip(terms, used) if u]
+    m.sort_indices()
+    return terms, m
+
+
+def _combine(segments, deleted, epsilon=BM25_EPSILON):
+    """Global TF-IDF / BM25 structures over the live documents of ``segments``.
+
+    ``deleted[i]`` holds the tombstoned local ids of segment ``i``. Document
+    ids are ``offset of the segment + local id``; deleted ids stay as empty
+    rows so ids never shift until a merge.
+    """
+    offsets = np.cumsum([0] + [s.n_docs for s in segments])
+    live = np.ones(offsets[-1], dtype=bool)
+    for off, dead in zip(offsets, deleted):
+        live[off + np.asarray(dead, dtype=np.int64)] = False
+    n_live = int(live.sum())
+
+    tfidf_terms, tf = _merge_postings(segments, offsets, live, "tfidf")
+    idf = tfidf_idf(np.diff(tf.indptr), n_live)
+    bm25_terms, bm = _merge_postings(segments, offsets, live, "bm25")
+    index = {t: i for i, t in enumerate(bm25_terms)}
+    order = list(dict.fromkeys(index[t] for s in segments for t in s.first_seen() if t in index))
+    doc_len = np.concatenate([np.zeros(0, np.int32)] + [np.asarray(s.arrays["doc_len"]) for s in segments])
+    return {
+        "live": live,
+        "n_live": n_live,
+        "tfidf_terms": tfidf_terms,
+        "tf": tf,
+        "X": tfidf_matrix(tf, idf),
+        "tfidf_idf": idf,
+        "bm25_terms": bm25_terms,
+        "bm25": bm,
+        "bm25_order": np.array(order, dtype=np.int64),
+        "bm25_idf": bm25_idf(np.diff(bm.indptr), n_live, order, epsilon),
+        "doc_len": doc_len,
+    }
+
+
+def _write_segment(index_dir, tfidf_terms, tf, bm25_terms, bm, order, doc_len, frame, bm25_params,
+                   tfidf_X=None, positions=None):
+    """Write one segment from count matrices (docs x terms) and its documents; returns its manifest entry.
+
+    ``tfidf_X`` overrides the standalone TF-IDF weights (same values, but
+    computed from the vectorizer's own row order; see ranking.tfidf_matrix).
+    ``positions`` (snippets.Positions) are stored for highlighted snippets.
+    """
+    from corpus_store import write_store
+
+    name = f"seg-{uuid.uuid4().hex[:12]}"
+    seg_dir = os.path.join(index_dir, "segments", name)
+    tmp_dir = seg_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    tf, bm = sparse.csc_matrix(tf), sparse.csc_matrix(bm)
+    tf.sort_indices()
+    bm.sort_indices()
+    doc_len = np.asarray(doc_len, dtype=np.int32)
+    arrays = {
+        "tf_indptr": tf.indptr.astype(np.int64),
+        "tf_docs": tf.indices.astype(np.int32),
+        "tf_counts": tf.data.astype(np.int32),
+        "bm25_indptr": bm.indptr.astype(np.int64),
+        "bm25_docs": bm.indices.astype(np.int32),
+        "bm25_tfs": bm.data.astype(np.int32),
+        "bm25_order": np.asarray(order, dtype=np.int64),
+        "doc_len": doc_len,
+    }
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "n_docs": len(doc_len),
+        "sum_doc_len": int(doc_len.sum()),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    terms = {"tfidf": tfidf_terms, "bm25": bm25_terms}
+
+    # weights/IDFs/bounds for when this segment is the whole index
+    alone = _combine([Segment(tmp_dir, arrays, terms, meta)], [[]], bm25_params["epsilon"])
+    engine = BM25Engine({}, alone["bm25"].indptr, alone["bm25"].indices, alone["bm25"].data,
+                        alone["bm25_idf"], doc_len, bm25_params["k1"], bm25_params["b"],
+                        float(doc_len.sum()) / max(len(doc_len), 1))
+    X = alone["X"] if tfidf_X is None else sparse.csc_matrix(tfidf_X)
+    arrays.update({
+        "tfidf_data": X.data,
+        "tfidf_idf": alone["tfidf_idf"],
+        "tfidf_max": X.max(axis=0).toarray().ravel(),
+        "bm25_idf": alone["bm25_idf"],
+        "bm25_max": engine.max_contrib,
+    })
+    for arr_name, arr in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{arr_name}.npy"), arr)
+    for kind, vocab in terms.items():
+        with open(os.path.join(tmp_dir, f"{kind}_vocab.json"), "w", encoding="utf-8") as fh:
+            json.dump(vocab, fh, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    write_store(frame, os.path.join(tmp_dir, "store"))
+    if positions is not None:
+        positions.save(tmp_dir)
+
+    os.rename(tmp_dir, seg_dir)
+    return {"name": name, "n_docs": meta["n_docs"], "n_live": meta["n_docs"],
+            "sum_doc_len": meta["sum_doc_len"], "deleted": None}
+
+
+def write_segment(df, index_dir, bm25_params):
+    """Analyze and index the documents of DataFrame ``df`` as a new segment; returns its manifest entry."""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    df = df.reset_index(drop=True)
+    docs = analyzed_text(df)
+    # TF-IDF counts use TfidfVectorizer's default tokenization
+    tfidf_terms, tf = _count(docs, CountVectorizer())
+    # weighted from the unsorted rows, bit-identical to TfidfVectorizer().fit_transform(docs)
+    X = tfidf_matrix(tf, tfidf_idf(np.bincount(tf.indices, minlength=tf.shape[1]), len(docs)))
+    # BM25 uses whitespace tokens (doc.split()), like BM25Okapi(tokenized_corpus)
+    bm25_terms, bm = _count(docs, CountVectorizer(analyzer=str.split))
+    ids = {t: i for i, t in enumerate(bm25_terms)}
+    order = [ids[w] for w in dict.fromkeys(w for doc in docs for w in doc.split())]
+    doc_len = np.asarray(bm.sum(axis=1)).ravel() if bm.shape[1] else np.zeros(len(docs))
+    frame = df.assign(**{TEXT_COLUMN: docs})
+    # word offsets into the original body for snippets (the stemmed text if there is no body)
+    column = "body" if "body" in frame.columns else TEXT_COLUMN
+    positions = Positions.build(frame[column].fillna("").astype(str).tolist(),
+                                docs.tolist() if column == "body" else None, column)
+    return _write_segment(index_dir, tfidf_terms, tf, bm25_terms, bm, order, doc_len, frame, bm25_params, X,
+                          positions)
+
+
+# -- generations ----------------------------------------------------------------
+
+class _IndexLock:
+    """Exclusive writer lock (``index/LOCK``); readers never take it."""
+
+    def __init__(self, index_dir, timeout=600, stale_after=3600):
+        self.path = os.path.join(index_dir, "LOCK")
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                        os.remove(self.path)  # left behind by a crashed writer
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{self.path} is held by another writer")
+                time.sleep(0.2)
+            else:
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+
+    def __exit__(self, *exc):
+        os.remove(self.path)
+
+
+def _manifest_path(index_dir, version):
+    return os.path.join(index_dir, "manifests", f"{version}.json")
+
+
+def read_manifest(index_dir=DEFAULT_INDEX_DIR, version=None):
+    """Manifest of ``version`` (default: CURRENT)."""
+    version = version or current_version(index_dir)
+    if version is None:
+        raise FileNotFoundError(f"no index found in {index_dir}")
+    with open(_manifest_path(index_dir, version), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise StaleIndexError(f"index format {manifest.get('format_version')} != {FORMAT_VERSION}")
+    return manifest
+
+
+def _publish(index_dir, manifest, generation):
+    """Write ``manifest`` as ``generation`` of its base, point CURRENT at it and drop old files."""
+    segments = manifest["segments"]
+    n_live = sum(s["n_live"] for s in segments)
+    total_len = sum(s["sum_doc_len"] for s in segments)
+    manifest.update({
+        "generation": generation,
+        "version": f"{manifest['base']}.{generation:06d}",
+        "published_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_docs": n_live,
+        "n_segments": len(segments),
+    })
+    manifest["bm25"]["avgdl"] = total_len / n_live if n_live else 0.0
+    os.makedirs(os.path.join(index_dir, "manifests"), exist_ok=True)
+    path = _manifest_path(index_dir, manifest["version"])
+    with open(path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(path + ".tmp", path)
+    _write_current(index_dir, manifest["version"])
+    _collect_garbage(index_dir)
+    return manifest["version"]
+
+
+def _collect_garbage(index_dir, keep=KEEP_GENERATIONS):
+    # caller holds the lock; keeps the newest `keep` manifests and everything they reference
+    manifest_dir = os.path.join(index_dir, "manifests")
+    paths = sorted((os.path.join(manifest_dir, f) for f in os.listdir(manifest_dir) if f.endswith(".json")),
+                   key=os.path.getmtime, reverse=True)
+    referenced = set()
+    for i, path in enumerate(paths):
+        if i >= keep:
+            os.remove(path)
+            continue
+        with open(path, encoding="utf-8") as fh:
+            for seg in json.load(fh)["segments"]:
+                referenced.add(seg["name"])
+                if seg["deleted"]:
+                    referenced.add(os.path.join(seg["name"], seg["deleted"]))
+    seg_root = os.path.join(index_dir, "segments")
+    for name in os.listdir(seg_root):
+        if name not in referenced:
+            shutil.rmtree(os.path.join(seg_root, name), ignore_errors=True)
+            continue
+        for f in os.listdir(os.path.join(seg_root, name)):
+            if f.startswith("deleted-") and os.path.join(name, f) not in referenced:
+                os.remove(os.path.join(seg_root, name, f))
+
+
+def _next_generation(index_dir):
+    # caller holds the lock; a rebuild continues the numbering, so it never reuses a version
+    # that caches or readers of the old manifest still hold
+    version = current_version(index_dir)
+    try:
+        return int(version.rsplit(".", 1)[1]) + 1
+    except (AttributeError, IndexError, ValueError):
+        return 1
+
+
+def _tombstone(index_dir, manifest, urls, version):
+    """Mark live documents whose url is in ``urls`` as deleted; returns how many were."""
+    urls = set(urls)
+    removed = 0
+    for entry in manifest["segments"]:
+        seg = Segment(os.path.join(index_dir, "segments", entry["name"]))
+        dead = seg.deleted(entry["deleted"])
+        store = seg.store()
+        if "url" not in store.columns:
+            continue
+        hits = np.array([i for i, u in enumerate(store.column("url")) if u in urls], dtype=np.int64)
+        hits = np.setdiff1d(hits, dead)
+        if not len(hits):
+            continue
+        filename = f"deleted-{version}.npy"
+        np.save(os.path.join(seg.path, filename), np.union1d(dead, hits))
+        entry["deleted"] = filename
+        entry["n_live"] -= len(hits)
+        entry["sum_doc_len"] -= int(np.asarray(seg.arrays["doc_len"])[hits].sum())
+        removed += len(hits)
+    return removed
+
+
+def build_index(corpus_path=DEFAULT_CORPUS, index_dir=DEFAULT_INDEX_DIR,
+                k1=BM25_K1, b=BM25_B, epsilon=BM25_EPSILON):
+    """Index the whole corpus CSV as a single segment and publish it; returns the new version.
+
+    Indexes the ``body_stemmed`` column; a corpus without one is run through
+    preprocessing.Analyzer first, so the postings always hold analyzed terms.
+    """
+    import pandas as pd
+
+    checksum = corpus_checksum(corpus_path)
+    df = pd.read_csv(corpus_path)
+    os.makedirs(os.path.join(index_dir, "segments"), exist_ok=True)
+    params = {"k1": k1, "b": b, "epsilon": epsilon}
+    with _IndexLock(index_dir):
+        entry = write_segment(df, index_dir, params)
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "base": f"v{FORMAT_VERSION}-{checksum[:12]}",
+            "corpus_path": os.path.abspath(corpus_path),
+            "corpus_sha256": checksum,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "bm25": params,
+            "segments": [entry],
+        }
+        return _publish(index_dir, manifest, _next_generation(index_dir))
+
+
+def add_documents(docs, index_dir=DEFAULT_INDEX_DIR, corpus_path=None):
+    """Add a DataFrame (or CSV path) of documents as a new segment; returns the new version.
+
+    Live documents with the same url are tombstoned first, so re-crawled
+    articles replace their old version. ``corpus_path`` re-stamps the index
+    with that corpus' checksum (pass it when the same delta was also folded
+    into the corpus CSV, e.g. with ``crawler.py --merge-into``).
+    """
+    import pandas as pd
+
+    df = pd.read_csv(docs) if isinstance(docs, str) else docs
+    if "url" in df.columns:
+        df = df.drop_duplicates("url", keep="last")
+    with _IndexLock(index_dir):
+        manifest = read_manifest(index_dir)
+        generation = manifest["generation"] + 1
+        version = f"{manifest['base']}.{generation:06d}"
+        if "url" in df.columns:
+            _tombstone(index_dir, manifest, df["url"].astype(str), version)
+        if len(df):
+            manifest["segments"].append(write_segment(df, index_dir, manifest["bm25"]))
+        if corpus_path:
+            manifest["corpus_sha256"] = corpus_checksum(corpus_path)
+        return _publish(index_dir, manifest, generation)
+
+
+def delete_documents(urls, index_dir=DEFAULT_INDEX_DIR, corpus_path=None):
+    """Tombstone the live documents with these urls; returns ``(new version, number deleted)``."""
+    with _IndexLock(index_dir):
+        manifest = read_manifest(index_dir)
+        generation = manifest["generation"] + 1
+        removed = _tombstone(index_dir, manifest, urls, f"{manifest['base']}.{generation:06d}")
+        if corpus_path:
+            manifest["corpus_sha256"] = corpus_checksum(corpus_path)
+        return _publish(index_dir, manifest, generation), removed
+
+
+def merge_segments(index_dir=DEFAULT_INDEX_DIR):
+    """Compact every segment of the current generation into one, dropping tombstoned documents.
+
+    Postings are remapped, not re-tokenized. Returns the new version (or the
+    current one if there was nothing to merge). Writers wait for the merge;
+    readers keep using the generation they loaded.
+    """
+    with _IndexLock(index_dir):
+        manifest = read_manifest(index_dir)
+        entries = manifest["segments"]
+        if len(entries) <= 1 and not any(e["deleted"] for e in entries):
+            return manifest["version"]
+        segments = [Segment(os.path.join(index_dir, "segments", e["name"])) for e in entries]
+        deleted = [s.deleted(e["deleted"]) for s, e in zip(segments, entries)]
+        c = _combine(segments, deleted, manifest["bm25"]["epsilon"])
+        keep = np.flatnonzero(c["live"])
+
+        from corpus_store import SegmentedStore
+        store = SegmentedStore([s.store() for s in segments], c["live"])
+        columns = [col for col in store.columns if col != "snippet"]
+        frame = store.frame(keep, columns).reset_index(drop=True)
+        positions = [Positions.load(s.path) for s in segments]
+        if all(p is not None for p in positions):
+            offsets = np.cumsum([0] + [s.n_docs for s in segments])
+            positions = Positions.merge([(p, np.flatnonzero(c["live"][offsets[i]:offsets[i + 1]]))
+                                         for i, p in enumerate(positions)])
+        else:
+            positions = None
+        entry = _write_segment(index_dir, c["tfidf_terms"], c["tf"].tocsr()[keep],
+                               c["bm25_terms"], c["bm25"].tocsr()[keep], c["bm25_order"],
+                               c["doc_len"][keep], frame, manifest["bm25"], positions=positions)
+        manifest["segments"] = [entry]
+        return _publish(index_dir, manifest, manifest["generation"] + 1)
+
+
+_merge_thread = None
+
+
+def merge_in_background(index_dir=DEFAULT_INDEX_DIR, max_segments=MAX_SEGMENTS):
+    """Start :func:`merge_segments` in a daemon thread once CURRENT has more than ``max_segments`` segments.
+
+    Returns the thread, or None if no merge was needed or one is already running.
+    """
+    global _merge_thread
+    try:
+        if len(read_manifest(index_dir)["segments"]) <= max_segments:
+            return None
+    except (OSError, StaleIndexError, KeyError, ValueError):
+        return None
+    if _merge_thread is not None and _merge_thread.is_alive():
+        return None
+    _merge_thread = threading.Thread(target=merge_segments, args=(index_dir,), name="index-merge", daemon=True)
+    _merge_thread.start()
+    return _merge_thread
+
+
+def _write_current(index_dir, version):
+    # Swap the CURRENT pointer atomically so readers never see a half-built index
+    tmp = os.path.join(index_dir, "CURRENT.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(version)
+    os.replace(tmp, os.path.join(index_dir, "CURRENT"))
+
+
+def current_version(index_dir=DEFAULT_INDEX_DIR):
+    """Version string the CURRENT pointer refers to, or None if nothing was built yet."""
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), encoding="utf-8") as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class SearchIndex:
+    """One loaded generation of the index.
+
+    A single segment without tombstones is used straight from its
+    memory-mapped arrays; otherwise the segments' postings are combined in
+    memory with IDFs from the live document counts (no re-tokenizing).
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, version=None):
+        self.path = index_dir
+        self.meta = read_manifest(index_dir, version)
+        entries = self.meta["segments"]
+        self.segments = [Segment(os.path.join(index_dir, "segments", e["name"])) for e in entries]
+        deleted = [s.deleted(e["deleted"]) for s, e in zip(self.segments, entries)]
+
+        if len(self.segments) == 1 and not len(deleted[0]):
+            seg = self.segments[0]
+            a = seg.arrays
+            self.tfidf_terms, self.bm25_terms = seg.terms["tfidf"], seg.terms["bm25"]
+            self.live = np.ones(seg.n_docs, dtype=bool)
+            self.X = sparse.csc_matrix((a["tfidf_data"], a["tf_docs"], a["tf_indptr"]),
+                                       shape=(seg.n_docs, len(self.tfidf_terms)), copy=False)
+            self.tfidf_idf, self.tfidf_max = a["tfidf_idf"], a["tfidf_max"]
+            self.bm25_indptr, self.bm25_docs, self.bm25_tfs = a["bm25_indptr"], a["bm25_docs"], a["bm25_tfs"]
+            self.bm25_idf, self.bm25_max = a["bm25_idf"], a["bm25_max"]
+            self.doc_len = a["doc_len"]
+        else:
+            c = _combine(self.segments, deleted, self.meta["bm25"]["epsilon"])
+            self.tfidf_terms, self.bm25_terms = c["tfidf_terms"], c["bm25_terms"]
+            self.live = c["live"]
+            self.X = c["X"]
+            self.tfidf_idf, self.tfidf_max = c["tfidf_idf"], None
+            bm = c["bm25"]
+            self.bm25_indptr = bm.indptr.astype(np.int64)
+            self.bm25_docs = bm.indices.astype(np.int32)
+            self.bm25_tfs = bm.data.astype(np.int32)
+            self.bm25_idf, self.bm25_max = c["bm25_idf"], None
+            self.doc_len = c["doc_len"]
+        self.tfidf_vocab = {t: i for i, t in enumerate(self.tfidf_terms)}
+        self.bm25_vocab = {t: i for i, t in enumerate(self.bm25_terms)}
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    @property
+    def n_docs(self):
+        """Number of live documents."""
+        return self.meta["n_docs"]
+
+    def tfidf_vectorizer(self):
+        """A fitted TfidfVectorizer rebuilt from the stored vocabulary and IDF (no refit)."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vec = TfidfVectorizer(vocabulary=self.tfidf_vocab)
+        vec.idf_ = np.asarray(self.tfidf_idf)
+        return vec
+
+    def tfidf(self):
+        return TfidfEngine(self.tfidf_vectorizer(), self.X, self.tfidf_max)
+
+    def bm25(self):
+        p = self.meta["bm25"]
+        return BM25Engine(self.bm25_vocab, self.bm25_indptr, self.bm25_docs, self.bm25_tfs,
+                          self.bm25_idf, self.doc_len, p["k1"], p["b"], p["avgdl"], self.bm25_max)
+
+    def documents(self):
+        """The indexed documents by doc id (a corpus_store.SegmentedStore)."""
+        from corpus_store import SegmentedStore
+        return SegmentedStore([s.store() for s in self.segments], self.live)
+
+    def snippeter(self):
+        """Query-highlighted snippets by doc id (a snippets.Snippeter)."""
+        from snippets import Snippeter
+        return Snippeter(self.segments)
+
+    def dense(self):
+        """The semantic (LSA + IVF) index built for this generation by dense.py, or None."""
+        from dense import DenseIndex, dense_path
+        return DenseIndex.load(dense_path(self.path, self.version), self.tfidf())
+
+
+def load_index(index_dir=DEFAULT_INDEX_DIR, corpus_path=DEFAULT_CORPUS, on_stale="rebuild"):
+    """Load the CURRENT generation, checking it against the corpus checksum.
+
+    ``on_stale`` decides what happens when the index is missing or was built
+    from a different corpus: ``"rebuild"`` builds a fresh one, ``"error"``
+    raises :class:`StaleIndexError`. Documents added with add_documents do
+    not make the index stale.
+    """
+    if on_stale not in ("rebuild", "error"):
+        raise ValueError(f"on_stale must be 'rebuild' or 'error', got {on_stale!r}")
+
+    version = current_version(index_dir)
+    index = None
+    reason = None
+    if version is None:
+        reason = f"no index found in {index_dir}"
+    else:
+        try:
+            index = SearchIndex(index_dir, version)
+        except (OSError, StaleIndexError, KeyError, ValueError) as e:
+            reason = f"index {version} unreadable: {e}"
+        else:
+            if index.meta["corpus_sha256"] != corpus_checksum(corpus_path):
+                reason = f"index {version} was built from a different {corpus_path}"
+                index = None
+
+    if index is not None:
+        return index
+    if on_stale == "error":
+        raise StaleIndexError(reason)
+    return SearchIndex(index_dir, build_index(corpus_path, index_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and update the on-disk TF-IDF/BM25 index for app.py')
+    parser.add_argument('--index-dir', '-o', default=DEFAULT_INDEX_DIR, help='Index directory')
+    sub = parser.add_subparsers(dest='command')
+    build = sub.add_parser('build', help='Index the whole corpus (default command)')
+    build.add_argument('--corpus', '-c', default=DEFAULT_CORPUS, help='Stemmed corpus CSV')
+    add = sub.add_parser('add', help='Add or replace documents (matched by url) from a CSV')
+    add.add_argument('csv', help='New/changed documents, stemmed or raw url,title,body,date')
+    add.add_argument('--corpus', help='Corpus CSV the delta was also merged into (re-stamps the checksum)')
+    delete = sub.add_parser('delete', help='Tombstone documents by url')
+    delete.add_argument('urls', nargs='+')
+    delete.add_argument('--corpus', help='Corpus CSV the documents were also removed from')
+    sub.add_parser('merge', help='Compact all segments into one')
+    sub.add_parser('info', help='Show the current generation')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    command = args.command or 'build'
+    if command == 'build':
+        version = build_index(getattr(args, 'corpus', DEFAULT_CORPUS), args.index_dir)
+    elif command == 'add':
+        version = add_documents(args.csv, args.index_dir, args.corpus)
+    elif command == 'delete':
+        version, removed = delete_documents(args.urls, args.index_dir, args.corpus)
+        print(f"{removed} documents tombstoned")
+    elif command == 'merge':
+        version = merge_segments(args.index_dir)
+    else:
+        version = current_version(args.index_dir)
+    elapsed = time.perf_counter() - start
+    meta = read_manifest(args.index_dir, version)
+    index = SearchIndex(args.index_dir, version)
+    print(f"Index {meta['version']} ({command}, {elapsed:.2f}s): {meta['n_docs']} live docs in "
+          f"{meta['n_segments']} segment(s), {len(index.tfidf_terms)} TF-IDF terms, "
+          f"{len(index.bm25_terms)} BM25 terms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Query-dependent result snippets from word positions stored in the index.
+
+The old preview was the first 200 characters of ``body_stemmed``: stemmed,
+stopword-free text that often had nothing to do with the query. Instead,
+every segment stores where each indexed word of the original ``body`` sits
+(UTF-8 byte offset, length and stem id). At query time, and only for the
+hits that are shown, the window of WINDOW_TOKENS indexed words containing
+the most distinct query terms is located with prefix sums, just that byte
+range is read from the memory-mapped store and the matching words are
+wrapped in ``<mark>``.
+
+Stems come from aligning each body's analyzed tokens with its
+``body_stemmed`` (Sastrawi stems word by word), so building positions never
+runs the stemmer; words that cannot be aligned keep their surface form.
+"""
+import os
+import re
+import json
+import html
+import numpy as np
+
+from preprocessing import clean_text, remove_stopwords, get_stopwords
+
+# indexed words of the raw body (ASCII letters/digits, inner hyphens as in Sastrawi's normalizer);
+# matched on the UTF-8 bytes so offsets index the store blob directly
+WORD_RE = re.compile(rb'[0-9A-Za-z]+(?:-[0-9A-Za-z]+)*')
+SPACE_RE = re.compile(r'\s+')
+# indexed (non-stopword) words per snippet, and how many are shown before the first match
+WINDOW_TOKENS = 24
+CONTEXT_TOKENS = 3
+# positions examined per hit: bounds the work on very long articles
+MAX_SCAN_TOKENS = 8000
+POSITIONS_FILE = 'positions.json'
+
+
+def stem_pairs(bodies, stemmed):
+    """``{word: stem}`` from the documents whose analyzed tokens line up one-to-one with their stemmed text."""
+    from stemming import tokenize
+    pairs = {}
+    for body, stems in zip(bodies, stemmed):
+        words = tokenize(remove_stopwords(clean_text(body)))
+        stems = stems.split()
+        if len(words) == len(stems):
+            pairs.update(zip(words, stems))
+    return pairs
+
+
+class Positions:
+    """Word positions of a segment's documents: ``start``/``length`` in bytes of ``column``, ``term`` ids into ``vocab``."""
+
+    ARRAYS = ('indptr', 'start', 'length', 'term')
+
+    def __init__(self, indptr, start, length, term, vocab, column):
+        self.indptr = indptr
+        self.start = start
+        self.length = length
+        self.term = term
+        self.vocab = vocab
+        self.column = column
+        self._ids = None
+
+    @classmethod
+    def build(cls, texts, stemmed=None, column='body'):
+        """Positions of the non-stopword words of ``texts``; ``stemmed`` (aligned analyzed texts) supplies the stems."""
+        stems = stem_pairs(texts, stemmed) if stemmed is not None else {}
+        stopwords = get_stopwords()
+        vocab = {}
+        indptr, start, length, term = [0], [], [], []
+        for text in texts:
+            for m in WORD_RE.finditer(text.encode('utf-8')):
+                word = m.group().decode('ascii').lower()
+                if word in stopwords:
+                    continue
+                term.append(vocab.setdefault(stems.get(word, word), len(vocab)))
+                start.append(m.start())
+                length.append(m.end() - m.start())
+            indptr.append(len(term))
+        return cls(np.array(indptr, dtype=np.int64), np.array(start, dtype=np.int32),
+                   np.minimum(np.array(length, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+                   np.array(term, dtype=np.int32), list(vocab), column)
+
+    @classmethod
+    def merge(cls, parts):
+        """Positions of the documents ``ids`` of each ``(positions, ids)`` part, in order, under one vocabulary."""
+        vocab = {}
+        indptr, start, length, term = [np.zeros(1, np.int64)], [], [], []
+        total = 0
+        for pos, ids in parts:
+            remap = np.array([vocab.setdefault(t, len(vocab)) for t in pos.vocab], dtype=np.int32)
+            for i in ids:
+                lo, hi = pos.indptr[i], pos.indptr[i + 1]
+                start.append(pos.start[lo:hi])
+                length.append(pos.length[lo:hi])
+                term.append(remap[pos.term[lo:hi]])
+                total += hi - lo
+                indptr.append(np.array([total], dtype=np.int64))
+        columns = {pos.column for pos, _ in parts}
+        return cls(np.concatenate(indptr), np.concatenate(start or [np.zeros(0, np.int32)]),
+                   np.concatenate(length or [np.zeros(0, np.uint16)]),
+                   np.concatenate(term or [np.zeros(0, np.int32)]), list(vocab),
+                   columns.pop() if len(columns) == 1 else 'body')
+
+    def save(self, path):
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'pos_{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, POSITIONS_FILE), 'w', encoding='utf-8') as fh:
+            json.dump({'column': self.column, 'vocab': self.vocab}, fh, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-mapped positions of the segment at ``path``, or None if it has none."""
+        if not os.path.exists(os.path.join(path, POSITIONS_FILE)):
+            return None
+        with open(os.path.join(path, POSITIONS_FILE), encoding='utf-8') as fh:
+            meta = json.load(fh)
+        # plain ndarray views of the maps: slicing an np.memmap is several times slower
+        arrays = [np.asarray(np.load(os.path.join(path, f'pos_{name}.npy'), mmap_mode='r'))
+                  for name in cls.ARRAYS]
+        return cls(*arrays, meta['vocab'], meta['column'])
+
+    def term_ids(self, tokens):
+        """Ids of the analyzed query ``tokens`` that occur in this vocabulary."""
+        if self._ids is None:
+            self._ids = {t: i for i, t in enumerate(self.vocab)}
+        return np.array(sorted({self._ids[t] for t in tokens if t in self._ids}), dtype=np.int32)
+
+    def n_words(self, i):
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+    def doc(self, i):
+        """``(start, length, term)`` arrays of document ``i``, cut to MAX_SCAN_TOKENS."""
+        lo = self.indptr[i]
+        hi = min(self.indptr[i + 1], lo + MAX_SCAN_TOKENS)
+        return self.start[lo:hi], self.length[lo:hi], self.term[lo:hi]
+
+
+def best_window(terms, query_ids, window=WINDOW_TOKENS, context=CONTEXT_TOKENS):
+    """``(lo, hi, match)``: token range of the window with the most distinct query terms (then most matches).
+
+    ``match`` marks the positions holding a query term. The window is
+    ``(0, window)`` when nothing matches, else it starts ``context`` tokens
+    before its first match.
+    """
+    n = len(terms)
+    # one comparison per query term: cheaper than np.isin on a few hundred positions
+    per_term = [terms == q for q in query_ids]
+    match = np.logical_or.reduce(per_term) if per_term else np.zeros(n, dtype=bool)
+    if n <= window or not match.any():
+        return 0, min(n, window), match
+    starts = np.arange(n - window + 1)
+
+    def in_window(hits):
+        cs = np.concatenate(([0], np.cumsum(hits)))
+        return cs[starts + window] - cs[starts]
+
+    distinct = sum((in_window(hits) > 0).astype(np.int64) for hits in per_term)
+    best = int(np.argmax(distinct * (window + 1) + in_window(match)))
+    first = best + int(np.argmax(match[best:best + window]))
+    lo = max(0, min(first - context, n - window))
+    return lo, lo + window, match
+
+
+def _text(raw):
+    return html.escape(SPACE_RE.sub(' ', raw.decode('utf-8', errors='ignore')))
+
+
+def highlight(raw, offset, start, length, match):
+    """HTML of the bytes ``raw`` (which begin at byte ``offset`` of the text) with the matching words in ``<mark>``."""
+    pieces = []
+    pos = 0
+    for s, n in zip(start[match] - offset, length[match]):
+        pieces.append(_text(raw[pos:s]))
+        pieces.append(f'<mark>{_text(raw[s:s + n])}</mark>')
+        pos = s + n
+    pieces.append(_text(raw[pos:]))
+    return ''.join(pieces)
+
+
+class Snippeter:
+    """Highlighted snippets for doc ids of a search_index.SearchIndex.
+
+    Segments without stored positions fall back to their static ``snippet``
+    column. Every snippet is escaped HTML.
+    """
+
+    def __init__(self, segments, window=WINDOW_TOKENS):
+        self.window = window
+        self.offsets = np.cumsum([0] + [s.n_docs for s in segments])
+        self.parts = [(Positions.load(s.path), s.store()) for s in segments]
+
+    def snippet(self, doc_id, tokens):
+        i = int(np.searchsorted(self.offsets, doc_id, side='right')) - 1
+        positions, store = self.parts[i]
+        local = int(doc_id - self.offsets[i])
+        if positions is None:
+            return html.escape(store.get('snippet', [local])[0]) if 'snippet' in store.columns else ''
+        start, length, terms = positions.doc(local)
+        if not len(terms):
+            return ''
+        query_ids = positions.term_ids(tokens)
+        lo, hi, match = best_window(terms, query_ids, self.window)
+        size = store.size(positions.column, local)
+        # from the very start / to the very end when the window reaches the first / last word
+        begin = int(start[lo]) if lo else 0
+        end = int(start[hi - 1]) + int(length[hi - 1]) if hi < positions.n_words(local) else size
+        raw = store.get_bytes(positions.column, local, begin, end)
+        body = highlight(raw, begin, start[lo:hi], length[lo:hi], match[lo:hi]).strip()
+        return ('... ' if begin > 0 else '') + body + (' ...' if end < size else '')
+
+    def snippets(self, doc_ids, tokens):
+        """One snippet per doc id; ``tokens`` are the analyzed query tokens."""
+        return [self.snippet(d, tokens) for d in doc_ids]
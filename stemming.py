@@ -0,0 +1,85 @@
+"""Sastrawi stemming with a persistent token -> stem cache and a process pool.
+
+Indonesian text repeats the same words constantly, so instead of stemming
+documents we stem vocabulary: every run loads the cache from disk, sends only
+tokens it has never seen to the worker processes (in chunks), appends the new
+pairs to the cache file and rebuilds the documents by lookup. Re-stemming
+after a small crawl delta then only costs the new words.
+
+Output is identical to ``StemmerFactory().create_stemmer().stem(text)``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CACHE_PATH = 'stem_cache.tsv'
+
+_stemmer = None
+
+
+def get_stemmer():
+    """The process' Sastrawi stemmer (workers build their own); preprocessing.py shares it."""
+    global _stemmer
+    if _stemmer is None:
+        from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+        _stemmer = StemmerFactory().create_stemmer()
+    return _stemmer
+
+
+def stem_words(words):
+    """Stem a list of already-normalized tokens; runs inside the worker processes."""
+    stemmer = get_stemmer()
+    return [stemmer.stem(w) for w in words]
+
+
+def tokenize(text):
+    """Sastrawi's own normalization + split, so cached stems line up with ``stemmer.stem``."""
+    from Sastrawi.Stemmer.Filter.TextNormalizer import normalize_text
+    return normalize_text(text).split(' ')
+
+
+class StemCache:
+    """Token -> stem mapping backed by an append-only TSV file (``path=None`` keeps it in memory)."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.stems = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    token, _, stem = line.rstrip('\n').partition('\t')
+                    self.stems[token] = stem
+
+    def __len__(self):
+        return len(self.stems)
+
+    def __contains__(self, token):
+        return token in self.stems
+
+    def update(self, pairs):
+        """Add new ``(token, stem)`` pairs and append them to the cache file."""
+        new = [(t, s) for t, s in pairs if t not in self.stems]
+        self.stems.update(new)
+        if self.path and new:
+            with open(self.path, 'a', encoding='utf-8') as fh:
+                fh.write(''.join(f'{t}\t{s}\n' for t, s in new))
+
+    def stem_documents(self, texts, executor=None, chunk_size=100):
+        """Stem many documents, computing only tokens missing from the cache.
+
+        Missing tokens are split into ``chunk_size`` work units and mapped over
+        ``executor`` (e.g. a ProcessPoolExecutor); without one they are stemmed
+        in this process.
+        """
+        docs = [tokenize(t) for t in texts]
+        missing = sorted({w for words in docs for w in words if w not in self.stems})
+        if missing:
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            results = executor.map(stem_words, chunks) if executor else map(stem_words, chunks)
+            for chunk, stems in zip(chunks, results):
+                self.update(zip(chunk, stems))
+        return [' '.join(self.stems[w] for w in words) for words in docs]
+
+
+def stem_pool(workers=None):
+    """Process pool for :meth:`StemCache.stem_documents` (defaults to os.cpu_count() workers)."""
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count())
@@ -0,0 +1,50 @@
+"""Checks for dedup.py: a large cluster of identical documents must cost linear work."""
+import random
+
+import numpy as np
+
+import dedup
+
+
+def _texts(n_identical, n_random=200, seed=0):
+    rng = random.Random(seed)
+    vocab = [f'w{i}' for i in range(5000)]
+    dup = ' '.join(rng.choices(vocab, k=300))
+    return [dup] * n_identical + [' '.join(rng.choices(vocab, k=200)) for _ in range(n_random)]
+
+
+def test_bucket_pairs_are_linear():
+    # every document in the same bucket of every band
+    sigs = np.zeros((4000, dedup.NUM_PERM), dtype=np.uint32)
+    bands, rows = dedup.lsh_params(dedup.DEFAULT_THRESHOLD)
+    pairs = dedup.candidate_pairs(sigs, bands, rows)
+    assert pairs == {(0, i) for i in range(1, 4000)}
+
+
+def test_identical_cluster_costs_no_pairwise_work(monkeypatch):
+    calls = []
+    jaccard = dedup.jaccard
+    monkeypatch.setattr(dedup, 'jaccard', lambda x, y: calls.append(1) or jaccard(x, y))
+    counts = []
+    for n in (1000, 4000):
+        calls.clear()
+        clusters, similarity = dedup.near_duplicate_clusters(_texts(n))
+        assert [len(c) for c in clusters] == [n]
+        assert similarity[(0, n - 1)] == 1.0
+        counts.append(len(calls))
+    # the exact Jaccard checks do not grow with the size of the identical cluster
+    assert counts[1] == counts[0]
+
+
+def test_near_duplicates_still_clustered():
+    rng = random.Random(1)
+    vocab = [f'w{i}' for i in range(3000)]
+    base = rng.choices(vocab, k=300)
+    texts = []
+    for j in range(5):
+        doc = list(base)
+        doc[j] = 'x'  # one changed word: Jaccard of the 3-shingles stays well above 0.8
+        texts.append(' '.join(doc))
+    texts.append(' '.join(rng.choices(vocab, k=300)))
+    clusters, _ = dedup.near_duplicate_clusters(texts)
+    assert clusters == [[0, 1, 2, 3, 4]]
@@ -0,0 +1,33 @@
+"""Checks for extraction.py: every installed backend extracts the same fields."""
+import pytest
+
+from extraction import KOMPASIANA, TALENTA, available_backends, extract
+
+BODY = """
+  <p>Hak cuti <b>12 hari</b><script>var z = 1;</script> per tahun.</p>
+  <p><style>.ad { display: none }</style>Diatur &amp; dijamin <a href="#">UU</a>.<noscript>aktifkan JS</noscript></p>
+  <p>   </p>
+  <p>Baris<br>baru</p>
+"""
+PAGE = """<html><head><title>x</title><style>p { color: red }</style></head><body>
+<nav><p>Menu</p></nav>
+<h1> Cuti <em>tahunan</em> karyawan <script>track('h1')</script></h1>
+<time datetime="2025-01-02">2 Januari 2025</time>
+%s
+<script>document.write('<p>iklan</p>')</script>
+</body></html>"""
+FIXTURES = [
+    (PAGE % f'<article>{BODY}</article>', TALENTA),
+    (PAGE % f'<div class="read__content">{BODY}</div>', KOMPASIANA),
+]
+
+
+@pytest.mark.parametrize('html,rule', FIXTURES)
+def test_backends_agree(html, rule):
+    results = {name: extract(html, rule=rule, backend=name) for name in available_backends()}
+    assert results
+    expected = {'title': 'Cutitahunankaryawan',  # get_text(strip=True) like the old scrapers
+                'body': 'Hak cuti 12 hari per tahun.\nDiatur & dijamin UU .\n\nBaris baru',
+                'date': '2 Januari 2025'}
+    for name, fields in results.items():
+        assert fields == expected, name
@@ -0,0 +1,24 @@
+"""Checks for ranking.py: MaxScore-pruned top-k must equal exhaustive top-k."""
+import os
+
+import pytest
+
+from benchmark import SUITE_QUERIES, verify_pruning
+from search_index import SearchIndex, build_index
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# the benchmark's corpus when it was built locally, else the stemmed corpus in the repo
+CORPUS = next(path for path in (os.path.join(HERE, name)
+                                for name in ('corpus_final_stemmed.csv', 'corpus_isi_kompasiana_stemmed.csv'))
+              if os.path.exists(path))
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    index_dir = str(tmp_path_factory.mktemp('index'))
+    return SearchIndex(index_dir, build_index(CORPUS, index_dir))
+
+
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_pruned_equals_exhaustive(index, k):
+    assert verify_pruning(index, SUITE_QUERIES, k) == []
@@ -0,0 +1,187 @@
+"""Per-stage timings of every search, aggregated into histograms.
+
+Hot-path code marks its stages with ``with span('score'):``. A search is
+wrapped in ``with tracer.trace('tfidf') as t:`` so the spans that run inside
+it (on the same thread) are also collected in ``t.stages`` for the debug
+panel; a trace can be entered again later, e.g. on the thread that renders
+the results. Every span feeds a histogram per ``(model, stage)``, exported
+with :meth:`Tracer.prometheus`.
+
+Stages recorded by the search code, each at most once per search:
+``analyze`` (query preprocessing), ``vectorize`` (the TF-IDF or LSA query
+vector of the analyzed terms), ``score`` (scoring; with MaxScore pruning
+this includes keeping the top k), ``top_k`` (selection after exhaustive
+scoring), ``fetch`` (reading the shown columns of the hits), ``snippet``
+(highlighted snippets, snippets.py), ``html`` (building the result cards in
+app.py) and ``render`` (writing them to the page).
+
+Set ``WORKWISE_TRACING=0`` to turn it off; a disabled span costs one
+function call and an empty ``with`` block (well under a microsecond).
+"""
+import os
+import bisect
+import threading
+import time
+
+# histogram upper bounds in seconds (Prometheus ``le`` labels)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5)
+METRIC_NAME = 'workwise_search_stage_seconds'
+# the stages above, in the order a search runs them
+STAGES = ('analyze', 'vectorize', 'score', 'top_k', 'fetch', 'snippet', 'html', 'render')
+
+_local = threading.local()
+
+
+class Histogram:
+    """Bucketed durations with Prometheus ``le`` semantics (bucket i counts values <= BUCKETS[i])."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated ``q``-quantile in seconds, interpolated inside its bucket like PromQL's histogram_quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+class Trace:
+    """Stage durations (seconds) of one search, in the order they first ran."""
+
+    def __init__(self, model):
+        self.model = model
+        self.stages = {}
+        self._outer = []
+
+    def __enter__(self):
+        self._outer.append(getattr(_local, 'trace', None))
+        _local.trace = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.trace = self._outer.pop()
+
+    def total(self):
+        return sum(self.stages.values())
+
+
+class _Null:
+    """Stands in for a span or trace while tracing is disabled."""
+    model = None
+    stages = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def total(self):
+        return 0.0
+
+
+_NULL = _Null()
+
+
+class _Span:
+    __slots__ = ('tracer', 'stage', 'start')
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.observe(self.stage, time.perf_counter() - self.start)
+
+
+class Tracer:
+    """Thread-safe histograms of stage durations per ``(model, stage)``."""
+
+    def __init__(self, enabled=True, buckets=BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def trace(self, model):
+        """A :class:`Trace` for one search of ``model`` (a no-op object when disabled)."""
+        return Trace(model) if self.enabled else _NULL
+
+    def span(self, stage):
+        return _Span(self, stage) if self.enabled else _NULL
+
+    def observe(self, stage, seconds, model=None):
+        """Record a duration; ``model`` defaults to the model of the trace active on this thread."""
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + seconds
+            if model is None:
+                model = trace.model
+        key = (model or '', stage)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def summary(self):
+        """One dict per ``(model, stage)``: count, mean and estimated p50/p95/p99 in milliseconds."""
+        rows = []
+        with self._lock:
+            for (model, stage), h in sorted(self.histograms.items()):
+                rows.append({
+                    'model': model, 'stage': stage, 'count': h.count,
+                    'mean_ms': h.sum / h.count * 1000,
+                    **{f'p{int(q * 100)}_ms': h.quantile(q) * 1000 for q in (0.5, 0.95, 0.99)},
+                })
+        return rows
+
+    def prometheus(self, name=METRIC_NAME):
+        """All histograms in the Prometheus text exposition format."""
+        lines = [f'# HELP {name} Time spent in each stage of a search.', f'# TYPE {name} histogram']
+        with self._lock:
+            for (model, stage), h in sorted(self.histograms.items()):
+                labels = f'model="{model}",stage="{stage}"'
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{{labels}}} {h.sum:.9f}')
+                lines.append(f'{name}_count{{{labels}}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+# shared by everything in the process (Streamlit sessions, API requests)
+tracer = Tracer(enabled=os.environ.get('WORKWISE_TRACING', '1') != '0')
+
+
+def span(stage):
+    """``with span('score'):`` times a stage on the process-wide :data:`tracer`."""
+    return tracer.span(stage)